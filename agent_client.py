@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+
+from procs import read_lines
+
+# CONFIGURATION
+AGENT_HOST = os.getenv("AGENT_HOST", "127.0.0.1")
+AGENT_PORT = int(os.getenv("AGENT_PORT", "7000"))  # host port published for the slot 0 agent
+AGENT_READY_TIMEOUT = float(os.getenv("AGENT_READY_TIMEOUT", "20"))  # after (re)creating the container
+# Shared secret the daemon checks on every request (the CLI's; api.py uses one per slot)
+AGENT_TOKEN = os.getenv("AGENT_TOKEN", "")
+# Script each phase maps to when the daemon isn't running and we have to docker exec
+SCRIPTS = {"strategize": "strategist.py", "attack": "attacker.py", "heal": "healer.py"}
+
+
+class AgentUnavailable(Exception):
+    """No agent daemon answered (or it refused our token); callers fall back to `docker exec`."""
+
+
+async def call_agent(phase, env=None, port=AGENT_PORT, on_line=None, host=AGENT_HOST, token=AGENT_TOKEN):
+    """
+    Runs one phase on the agent daemon (chaos-agent/agent_server.py), relaying each output
+    line to `on_line`. Returns the phase's exit code. Raises AgentUnavailable if nothing
+    is listening, including docker's port proxy accepting and immediately closing.
+    """
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        raise AgentUnavailable(str(e)) from e
+    answered = False
+    try:
+        writer.write((json.dumps({"phase": phase, "env": env or {}, "token": token}) + "\n").encode())
+        await writer.drain()
+        async for raw in read_lines(reader):
+            if not raw.strip():
+                continue
+            answered = True
+            message = json.loads(raw)
+            if message["type"] == "exit":
+                if message.get("error") == "unauthorized":
+                    raise AgentUnavailable("agent daemon rejected the token")
+                return message["code"]
+            if on_line:
+                on_line(message["text"])
+        if not answered:
+            raise AgentUnavailable("connection closed without a reply")
+        return None  # daemon died mid-phase
+    except ConnectionError as e:
+        if not answered:
+            raise AgentUnavailable(str(e)) from e
+        return None
+    finally:
+        writer.close()
+
+
+async def wait_for_agent(port=AGENT_PORT, host=AGENT_HOST, timeout=AGENT_READY_TIMEOUT, token=AGENT_TOKEN):
+    """
+    Pings the daemon until it answers. A freshly started container publishes its port
+    before the daemon listens (docker's proxy accepts, then closes), so "connectable"
+    isn't enough. Returns False on timeout, e.g. an agent image without the daemon.
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    delay = 0.1
+    while True:
+        try:
+            if await call_agent("ping", port=port, host=host, token=token) == 0:
+                return True
+        except AgentUnavailable:
+            pass
+        if asyncio.get_running_loop().time() + delay > deadline:
+            return False
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 1.0)
+
+
+def call_agent_sync(phase, env=None, port=AGENT_PORT, on_line=print):
+    return asyncio.run(call_agent(phase, env, port, on_line))
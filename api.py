@@ -1,15 +1,32 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional # Added for optional fields
-import subprocess
+from contextlib import asynccontextmanager
 import asyncio
+import functools
 import json
 import os
-import shutil
-import stat
+import time
 
-app = FastAPI()
+from agent_client import call_agent, wait_for_agent, AgentUnavailable, SCRIPTS
+import metrics
+import rollout
+from missions import Scheduler
+from procs import run_step, StepTimeout
+from readiness import wait_for_victim
+from snapshots import SnapshotStore
+from telemetry import TelemetryCollector
+from repo_cache import sync_repo, write_record, file_digest, tree_sha, SyncError
+
+@asynccontextmanager
+async def lifespan(app):
+    SCHEDULER.start()
+    yield
+    await SCHEDULER.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,152 +39,541 @@ app.add_middleware(
 class DeployRequest(BaseModel):
     repo_url: str
     user_id: Optional[str] = None  # If None -> Lightning Mode
+    ref: Optional[str] = None  # Branch, tag or commit. Defaults to the remote HEAD
+
+
+# Per-step time budgets (seconds). Override with e.g. STEP_TIMEOUT_BUILD=3600
+STEP_TIMEOUTS = {
+    name: float(os.getenv(f"STEP_TIMEOUT_{name.upper()}", default))
+    for name, default in {
+        "stop": 60, "clone": 600, "build": 1800, "strategy": 600,
+        "attack": 900, "heal": 900, "restart": 120, "verify": 900,
+    }.items()
+}
+
+# Injected when the target repo ships no Dockerfile. Dependencies resolve in their own
+# layer (re-run only when pom.xml changes) and the local Maven repository lives in a
+# BuildKit cache mount shared by every build, so warm rebuilds only compile sources.
+DOCKERFILE_TEMPLATE = """# syntax=docker/dockerfile:1
+FROM maven:3.9-eclipse-temurin-17 AS build
+WORKDIR /build
+COPY pom.xml .
+RUN --mount=type=cache,id=entropy-m2,target=/root/.m2 mvn -B -q dependency:go-offline || true
+COPY . .
+RUN --mount=type=cache,id=entropy-m2,target=/root/.m2 mvn -B -q package -DskipTests && cp target/*.jar /build/app.jar \\
+    && mkdir /build/app && cd /build/app && jar -xf /build/app.jar
+
+# A JDK and the unpacked jar let a healed class be recompiled and swapped in without
+# rebuilding the image (rollout.py); the supervisor restarts the JVM when asked to
+FROM eclipse-temurin:17-jdk-alpine
+WORKDIR /app
+COPY --from=build /build/app exploded
+COPY --chmod=755 <<'EOF' /usr/local/bin/entropy-run
+#!/bin/sh
+# Runs the app. The JVM is restarted only when a hot redeploy set the flag file;
+# any other exit (a crash included) ends the container as before.
+main=$(sed -n 's/^Main-Class: *//p' /app/exploded/META-INF/MANIFEST.MF | tr -d '\\r')
+rm -f /tmp/entropy-jvm.pid /tmp/entropy-redeploy
+trap 'kill "$(cat /tmp/entropy-jvm.pid)" 2>/dev/null; wait; exit 143' TERM INT
+while :; do
+    java -cp /app/exploded "$main" &
+    echo $! > /tmp/entropy-jvm.pid
+    wait $!
+    code=$?
+    [ -f /tmp/entropy-redeploy ] || exit $code
+    rm -f /tmp/entropy-redeploy
+done
+EOF
+CMD ["entropy-run"]
+"""
 
-STATE = {
+# Keeps VCS metadata and host build output out of the build context
+DOCKERIGNORE_TEMPLATE = """.git
+target
+"""
+
+# Pre-heal copies of every slot's victim tree, for rolling a bad patch back
+SNAPSHOTS = SnapshotStore()
+
+# Prefix of the structured lines agent scripts emit via chaos-agent/agent_metrics.py
+METRIC_PREFIX = "[METRIC] "
+# Prefix of the strategist's per-finding lines, published while the analysis is still running
+CARD_PREFIX = "[CARD] "
+# Start attacking as soon as the victim is up, following the strategist's card stream
+FOLLOW_PLAN = os.getenv("ATTACK_FOLLOW_PLAN", "off") == "on"
+
+IDLE_STATE = {
     "status": "IDLE", 
     "phase": "READY", 
     "logs": [],
+    "cursor": -1,
     "vulnerabilities": [], 
     "telemetry": {"cpu": 10, "memory": 20},
     "current_repo": "Local Default",
     "mode": "LIGHTNING" # Track current mode
 }
 
-def log(message):
-    print(message)
-    STATE["logs"].append(message)
+async def run(mission, step, cmd, on_line=None, on_err=None, env=None, kill_cmd=None):
+    """Runs one external step off the event loop. Returns the exit code, or None on timeout."""
+    started = time.monotonic()
+    code = None
+    try:
+        code = await run_step(cmd, timeout=STEP_TIMEOUTS[step], on_line=on_line, on_err=on_err, env=env,
+                              kill_cmd=kill_cmd)
+        return code
+    except StepTimeout as e:
+        mission.log(f"Step '{step}' timed out: {e}")
+        return None
+    finally:
+        mission.record_step(step, time.monotonic() - started, code)
+
+def agent_pidfile(script):
+    return f"/tmp/entropy-{script}.pid"
 
-def remove_readonly(func, path, exc):
-    os.chmod(path, stat.S_IWRITE)
-    func(path)
+def agent_exec(slot, script, env_vars=()):
+    # Through sh so the script's pid lands in a file agent_kill() can use (the slim
+    # image has no pkill)
+    cmd = ["docker", "exec", "-i"]
+    for name, value in env_vars:
+        cmd += ["-e", f"{name}={value}"]
+    return cmd + [slot.agent_container, "sh", "-c", f"echo $$ > {agent_pidfile(script)} && exec python -u {script}"]
+
+def agent_kill(slot, script):
+    """Stops a timed-out or cancelled agent_exec() script inside the container."""
+    return ["docker", "exec", slot.agent_container, "sh", "-c", f"kill $(cat {agent_pidfile(script)}) 2>/dev/null"]
+
+async def agent_phase(mission, slot, step, phase, env_vars=(), on_line=None, on_err=None):
+    """
+    Runs a phase on the slot's warm agent daemon, or with a cold `docker exec` when the
+    daemon isn't reachable (e.g. an agent image from before it existed).
+    Returns the exit code, or None on timeout. "[METRIC]" lines are recorded and "[CARD]"
+    findings are added to the mission as they arrive, rather than logged verbatim.
+    """
+    def relay(line):
+        if line.startswith(METRIC_PREFIX):
+            try:
+                mission.record_metric(json.loads(line[len(METRIC_PREFIX):]))
+            except ValueError:
+                pass
+        elif line.startswith(CARD_PREFIX):
+            try:
+                card = json.loads(line[len(CARD_PREFIX):])
+            except ValueError:
+                return
+            mission.vulnerabilities.append(card)
+            mission.log(f"🎯 Found: {card.get('name')} ({card.get('severity')}) at {card.get('trigger_endpoint')}")
+        elif on_line:
+            on_line(line)
+
+    started = time.monotonic()
+    code = None
+    try:
+        code = await asyncio.wait_for(call_agent(phase, dict(env_vars), slot.agent_port, relay,
+                                                  token=slot.agent_token),
+                                      STEP_TIMEOUTS[step])
+    except AgentUnavailable:
+        return await run(mission, step, agent_exec(slot, SCRIPTS[phase], env_vars), on_line=relay, on_err=on_err,
+                         kill_cmd=agent_kill(slot, SCRIPTS[phase]))
+    except asyncio.TimeoutError:
+        mission.log(f"Step '{step}' timed out: agent phase '{phase}' exceeded {STEP_TIMEOUTS[step]:g}s")
+    mission.record_step(step, time.monotonic() - started, code)
+    return code
 
-def setup_target_repo(repo_url: str):
-    target_dir = "victim-app"
-    # ... (Keep your existing setup_target_repo logic exactly as is) ...
-    # For brevity in this snippet, assume standard cloning logic here
-    # Use your original function code!
+async def setup_target_repo(mission, slot):
+    """
+    Syncs the slot's working tree to the requested commit via the local clone cache.
+    Returns (record, previous_record), or (None, None) on failure. Comparing the two
+    tells the caller whether the victim image has to be rebuilt.
+    """
+    target_dir = slot.target_dir
+    log = mission.log
     log("Stopping container to release file locks...")
-    subprocess.run(["docker", "stop", "victim_container"], stderr=subprocess.DEVNULL)
-    
-    log(f"Cleaning up previous target in {target_dir}...")
-    if os.path.exists(target_dir):
-        try:
-            shutil.rmtree(target_dir, onexc=remove_readonly)
-        except Exception as e:
-            log(f"Warning: Could not fully clean folder: {e}")
-            return False
+    await run(mission, "stop", ["docker", "stop", slot.victim_container])
 
-    log(f"⬇ Cloning {repo_url}...")
+    log(f"⬇ Syncing {mission.repo_url} ({mission.ref or 'default branch'})...")
     try:
-        subprocess.run(["git", "clone", "--depth", "1", repo_url, target_dir], check=True)
-    except subprocess.CalledProcessError:
-        log("Git Clone Failed. Is the URL correct?")
-        return False
+        sha, previous = await sync_repo(mission.repo_url, target_dir, mission.ref or "HEAD",
+                                        timeout=STEP_TIMEOUTS["clone"], log=log)
+        tree = await tree_sha(target_dir)
+    except (SyncError, StepTimeout) as e:
+        log(f"Git Sync Failed ({e}). Is the URL correct?")
+        return None, None
+    mission.commit = sha
+    log(f"Target resolved to commit {sha[:12]}.")
 
     if not os.path.exists(f"{target_dir}/Dockerfile"):
         log("No Dockerfile found. Injecting 'Universal Spring Boot' template...")
-        dockerfile_content = """
-FROM eclipse-temurin:17-jdk-alpine
-WORKDIR /app
-COPY . .
-RUN if [ -f "./mvnw" ]; then ./mvnw clean package -DskipTests; else apk add maven && mvn clean package -DskipTests; fi
-CMD java -jar target/*.jar
-        """
         with open(f"{target_dir}/Dockerfile", "w") as f:
-            f.write(dockerfile_content)
+            f.write(DOCKERFILE_TEMPLATE)
+        if not os.path.exists(f"{target_dir}/.dockerignore"):
+            with open(f"{target_dir}/.dockerignore", "w") as f:
+                f.write(DOCKERIGNORE_TEMPLATE)
+
+    record = {"repo_url": mission.repo_url, "sha": sha, "tree_sha": tree,
+              "dockerfile_sha": file_digest(f"{target_dir}/Dockerfile"), "built": False}
+    write_record(target_dir, record)
+    return record, previous
+
+async def read_agent_json(mission, slot, step, name, default=None):
+    """Reads a JSON file the agent wrote out of this slot's agent container."""
+    lines = []
+    code = await run(mission, step, ["docker", "exec", slot.agent_container, "cat", name], on_line=lines.append)
+    if code != 0:
+        return default
+    try:
+        return json.loads("\n".join(lines))
+    except ValueError:
+        mission.log(f"Agent wrote an unreadable {name}.")
+        return default
+
+async def remove_agent_files(mission, slot, step, *names):
+    """Deletes stale outputs so a phase that fails can't be judged on a previous run's file."""
+    await run(mission, step, ["docker", "exec", slot.agent_container, "rm", "-f", *names], on_err=mission.log)
+
+async def load_attack_plan(mission, slot):
+    return await read_agent_json(mission, slot, "strategy", "attack_plan.json", default=[])
+
+async def deploy_victim(mission, slot, record, files=None):
+    """
+    Puts the work tree live: hot redeploy of the changed classes when possible, else a
+    full rebuild. Waits for readiness. Returns False if the victim didn't come back.
+    """
+    log = mission.log
+    # Recompile just the changed classes inside the victim and restart its JVM...
+    restart_started = await rollout.redeploy(slot.victim_container, slot.target_dir, log=log,
+                                             run=functools.partial(run, mission, "restart"), files=files)
+    if restart_started is not None:
+        write_record(slot.target_dir, {**record, "built": True, "hot_patched": True})
+    else:
+        # ...or rebuild the image from the patched tree, which no later mission may reuse
+        write_record(slot.target_dir, {**record, "built": False})
+        restart_started = time.time()
+        if await run(mission, "build", slot.compose("up", "-d", "--build", "--force-recreate", "victim-app"),
+                     on_line=print, on_err=print, env=slot.compose_env()) != 0:
+            log("Victim build failed.")
+            return False
+    return await wait_for_victim(slot.victim_container, slot.health_url, since=restart_started, log=log)
+
+async def rollback(mission, slot, record, snapshot, reason, after):
+    """Restores the pre-heal sources and redeploys them."""
+    log = mission.log
+    mission.phase = "ROLLBACK"
+    log(f"↩ Rolling back the patch: {reason}")
+    with mission.span("rollback", after=after):
+        changed = await asyncio.to_thread(SNAPSHOTS.restore, slot.target_dir, snapshot)
+        log(f"Restored {len(changed)} file(s) from snapshot {snapshot[:12]}.")
+        if not await deploy_victim(mission, slot, record, files=changed):
+            log("Original victim failed to come back after the rollback.")
+            return False
+    return True
+
+async def mission_loop(mission, slot):
+    try:
+        await _run_mission(mission, slot)
+    except asyncio.CancelledError:
+        mission.status = "CANCELLED"
+        mission.log("Mission cancelled.")
+    except Exception as e:
+        mission.status = "FAILED"
+        mission.log(f"Mission crashed: {e}")
+    finally:
+        if mission.collector:
+            await mission.collector.stop()
+
+async def boot_victim(mission, slot, record, previous):
+    """Builds (if needed) and starts the victim, waits for readiness and starts telemetry."""
+    log = mission.log
+    env = slot.compose_env()
+    # Same source tree + same Dockerfile as the last successful build: the image is still valid
+    # (compares git tree hashes, so commits that only move refs or metadata don't rebuild)
+    unchanged = previous.get("built") and all(previous.get(k) == record[k] for k in ("tree_sha", "dockerfile_sha"))
+    with mission.span("build", after=("setup",)):
+        if unchanged:
+            log("Sources and Dockerfile unchanged since last build. Reusing victim image...")
+            up_args = ("up", "-d", "victim-app")
+            if previous.get("hot_patched"):
+                # The old container still carries the last mission's hot-deployed classes
+                up_args += ("--force-recreate",)
+        else:
+            log("Rebuilding Victim Container...")
+            up_args = ("up", "-d", "--build", "--force-recreate", "victim-app")
+        boot_started = time.time()
+        if await run(mission, "build", slot.compose(*up_args), on_line=print, on_err=print, env=env) != 0:
+            log("Victim build failed.")
+            return False
+        mission.build_seconds = round(time.time() - boot_started, 2)
+        log(f"Victim {'started' if unchanged else 'built and started'} in {mission.build_seconds:.1f}s.")
+        write_record(slot.target_dir, {**record, "built": True})
+
+    with mission.span("boot", after=("build",)):
+        log("Waiting for Victim App to boot...")
+        if not await wait_for_victim(slot.victim_container, slot.health_url, since=boot_started, log=log):
+            log("Victim never became ready.")
+            return False
 
+    # Sample the victim's real resource usage for the rest of the mission
+    mission.collector = TelemetryCollector(mission, slot.victim_container)
+    mission.collector.start()
     return True
 
-async def mission_loop(repo_url: str, user_id: str = None):
-    STATE["logs"] = []
-    STATE["vulnerabilities"] = []
-    STATE["status"] = "RUNNING"
-    STATE["current_repo"] = repo_url
+async def start_agent(mission, slot):
+    """(Re)creates the agent sidecar if needed and waits for its daemon to answer."""
+    with mission.span("agent", after=("setup",)):
+        # Only needs (re)creating the first time a slot is used
+        await run(mission, "build", slot.compose("up", "-d", "chaos-agent"), on_line=print, on_err=print,
+                  env=slot.compose_env())
+        if not await wait_for_agent(slot.agent_port, token=slot.agent_token):
+            mission.log("Agent daemon not answering. Phases will run with docker exec.")
+
+async def analyze(mission, slot, agent):
+    """Strategist pass. Only reads the synced sources, so it doesn't need a running victim."""
+    log = mission.log
+    await agent
+    with mission.span("strategy", after=("agent",)):
+        log("AI Agent scanning repository structure...")
+
+        # Pass user_id env var if it exists (Strategist uses this to decide on DB upload)
+        env_vars = [("PLAN_RUN", mission.id)] + ([("USER_ID", mission.user_id)] if mission.user_id else [])
+
+        await agent_phase(mission, slot, "strategy", "strategize", env_vars, on_line=log, on_err=log)
+
+        # Load results for display
+        try:
+            mission.vulnerabilities = await load_attack_plan(mission, slot)
+            log(f"Analysis Complete. Detected {len(mission.vulnerabilities)} issues.")
+        except Exception as e:
+            log(f"Error reading report: {e}")
+
+async def attack_victim(mission, slot, after, agent, follow=False):
+    """Attack pass: runs the saved plan, or follows the strategist's card stream as it grows."""
+    await agent
+    mission.phase = "ATTACK"
+    mission.log("Launching Exploits..." + (" (following the analysis as it streams)" if follow else ""))
+    env_vars = [("PLAN_RUN", mission.id), ("ATTACK_FOLLOW", "on" if follow else "off")]
+    with mission.span("attack", after=after):
+        await remove_agent_files(mission, slot, "attack", "attack_report.json")
+        await agent_phase(mission, slot, "attack", "attack", env_vars, on_line=mission.log, on_err=print)
+
+def log_critical_path(mission):
+    timings = mission.timings()
+    steps = timings["steps"]
+    path = " -> ".join(f"{name} {steps[name]['seconds']}s" for name in timings["critical_path"])
+    mission.log(f"⏱ Critical path ({timings['total_seconds']}s): {path}")
+
+async def _run_mission(mission, slot):
+    log = mission.log
+    mission.status = "RUNNING"
     
     # DETERMINE MODE
-    mode = "DASHBOARD" if user_id else "LIGHTNING"
-    STATE["mode"] = mode
-    log(f"🚀 INITIALIZING ENTROPY AGENT in [{mode} MODE]...")
+    mode = mission.mode
+    log(f"🚀 INITIALIZING ENTROPY AGENT in [{mode} MODE] on worker slot {slot.index}...")
 
     # STEP 1: SETUP (Common to both)
-    STATE["phase"] = "SETUP"
-    success = setup_target_repo(repo_url)
-    if not success:
-        STATE["status"] = "FAILED"
+    mission.phase = "SETUP"
+    with mission.span("setup"):
+        record, previous = await setup_target_repo(mission, slot)
+    if record is None:
+        mission.status = "FAILED"
         log("Setup failed. Aborting mission.")
         return
 
-    log("Rebuilding Victim Container...")
-    subprocess.run(["docker-compose", "up", "-d", "--build", "--force-recreate", "victim-app"])
-    
-    log("Waiting for Victim App to boot (45s)...") 
-    await asyncio.sleep(45)
-
-    # STEP 2: STRATEGY (Common to both)
-    STATE["phase"] = "STRATEGY"
-    log("AI Agent scanning repository structure...")
-    
-    # Pass user_id env var if it exists (Strategist uses this to decide on DB upload)
-    env_vars = ["-e", f"USER_ID={user_id}"] if user_id else []
-    
-    subprocess.run(["docker", "exec", "-i"] + env_vars + ["agent_container", "python", "strategist.py"])
-    
-    # Load results for display
+    # STEP 2: BOOT + STRATEGY (Common to both)
+    # Pipeline: setup -> (build -> boot) || (agent -> strategy) -> attack. The model's
+    # latency hides behind the image build and JVM start instead of adding to them.
+    # With FOLLOW_PLAN the attack starts once the victim is up and takes each card as the
+    # strategist streams it: setup -> (build -> boot -> attack) || (agent -> strategy).
+    mission.phase = "STRATEGY"
+    agent = asyncio.create_task(start_agent(mission, slot))
+    boot = asyncio.create_task(boot_victim(mission, slot, record, previous))
+    analysis = asyncio.create_task(analyze(mission, slot, agent))
+    attack = None
     try:
-        if os.path.exists("chaos-agent/attack_plan.json"):
-            with open("chaos-agent/attack_plan.json", "r") as f:
-                STATE["vulnerabilities"] = json.load(f)
-                log(f"Analysis Complete. Detected {len(STATE['vulnerabilities'])} issues.")
-    except Exception as e:
-        log(f"Error reading report: {e}")
-
-    # STEP 3: ATTACK (Common to both)
-    STATE["phase"] = "ATTACK"
-    log("Launching Exploits...")
-    proc = subprocess.Popen(
-        ["docker", "exec", "-i", "agent_container", "python", "attacker.py"],
-        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    while True:
-        line = proc.stdout.readline()
-        if not line: break
-        if line.strip(): log(line.strip())
+        if not await boot:
+            mission.status = "FAILED"
+            log("Victim failed to start. Aborting mission.")
+            return
+        if FOLLOW_PLAN:
+            attack = asyncio.create_task(attack_victim(mission, slot, ("boot", "agent"), agent, follow=True))
+        await analysis
+        if attack is not None:
+            # A strategist that died before its trailer would leave the attack waiting for more cards
+            await run(mission, "strategy", ["docker", "exec", slot.agent_container, "python", "-c",
+                                            "import sys, plan_stream; plan_stream.seal(sys.argv[1])", mission.id],
+                      on_line=log, on_err=log)
+        waited = mission.spans["strategy"]["end"] - mission.spans["boot"]["end"]
+        log(f"Victim ready and analysis done ({'analysis' if waited > 0 else 'boot'} was the "
+            f"critical path by {abs(waited):.1f}s).")
+
+        # STEP 3: ATTACK (Common to both)
+        if attack is None:
+            attack = asyncio.create_task(attack_victim(mission, slot, ("boot", "strategy"), agent))
+        await attack
+    finally:
+        tasks = [task for task in (agent, boot, analysis, attack) if task]
+        for task in tasks:
+            task.cancel()
+        # Let their subprocess teardown finish before the slot can take another mission
+        await asyncio.gather(*tasks, return_exceptions=True)
 
     # --- BRANCHING POINT ---
     if mode == "LIGHTNING":
-        STATE["status"] = "COMPLETE"
-        STATE["phase"] = "COMPLETE"
+        log_critical_path(mission)
+        mission.status = "COMPLETE"
+        mission.phase = "COMPLETE"
         log("⚡ LIGHTNING RUN COMPLETE.")
         log("Sign up to enable Auto-Healing and Persistent Reports.")
         return
 
     # STEP 4: HEAL (Dashboard Only)
-    STATE["phase"] = "HEAL"
+    mission.phase = "HEAL"
     log("Applying Autonomous Patches (GenAI)...")
-    subprocess.run(["docker", "exec", "-i", "agent_container", "python", "healer.py"])
-    
-    log("Restarting Victim to apply fixes...")
-    subprocess.run(["docker", "restart", "victim_container"])
-    await asyncio.sleep(15)
+    with mission.span("heal", after=("attack",)):
+        # Content-addressed, so unchanged files cost nothing; restoring it takes milliseconds
+        snapshot = await asyncio.to_thread(SNAPSHOTS.take, slot.target_dir)
+        log(f"Snapshot {snapshot[:12]} taken before patching.")
+        await asyncio.to_thread(SNAPSHOTS.prune)
+        code = await agent_phase(mission, slot, "heal", "heal", on_line=log, on_err=log)
+        patched = await asyncio.to_thread(SNAPSHOTS.diff, snapshot, slot.target_dir)
+        log(f"Heal changed {len(patched)} file(s): {', '.join(patched) or 'none'}.")
+        if code != 0 and patched:
+            # The running victim still has the original code; only the work tree needs undoing
+            await asyncio.to_thread(SNAPSHOTS.restore, slot.target_dir, snapshot)
+            log(f"Heal failed part-way. Restored {len(patched)} file(s) from snapshot {snapshot[:12]}.")
+    if code != 0 or not patched:
+        log_critical_path(mission)
+        log("Healing failed. Nothing was deployed." if code != 0
+            else "MISSION COMPLETE. No patch was produced, so the victim is unchanged.")
+        mission.phase = "COMPLETE"
+        mission.status = "FAILED" if code != 0 else "UNPATCHED"
+        return
+
+    log("Deploying fixes to the Victim...")
+    with mission.span("restart", after=("heal",)):
+        deployed = await deploy_victim(mission, slot, record, files=patched)
+    if not deployed:
+        restored = await rollback(mission, slot, record, snapshot, "patched victim failed to build or boot", ("restart",))
+        log("Aborting verification.")
+        mission.status = "ROLLED_BACK" if restored else "FAILED"
+        return
 
     # STEP 5: VERIFY (Dashboard Only)
-    STATE["phase"] = "VERIFY"
+    mission.phase = "VERIFY"
     log("Verifying security posture...")
-    subprocess.run(["docker", "exec", "-i", "agent_container", "python", "attacker.py"])
+    with mission.span("verify", after=("restart",)):
+        await remove_agent_files(mission, slot, "verify", "verify_report.json")
+        code = await agent_phase(mission, slot, "verify", "attack", [("ATTACK_REPORT", "verify_report.json")],
+                                 on_line=log, on_err=print)
+        baseline = await read_agent_json(mission, slot, "verify", "attack_report.json")
+        verify = await read_agent_json(mission, slot, "verify", "verify_report.json")
+    if code != 0 or baseline is None or verify is None:
+        # Nothing to compare: the patch stays, but the mission can't claim it's secure
+        missing = "the verification attack failed" if code != 0 else "an attack report is missing"
+        log_critical_path(mission)
+        log(f"Could not verify the patch: {missing}.")
+        mission.phase = "COMPLETE"
+        mission.status = "UNVERIFIED"
+        return
+    regressed = rollout.regressions(baseline, verify)
+    if regressed:
+        for reason in regressed:
+            log(f"⚠ Regression: {reason}")
+        restored = await rollback(mission, slot, record, snapshot, "VERIFY regressed", ("verify",))
+        log_critical_path(mission)
+        log("MISSION COMPLETE. Patch rejected, original code restored." if restored
+            else "Patch rejected, but the original code failed to come back.")
+        mission.phase = "COMPLETE"
+        mission.status = "ROLLED_BACK" if restored else "FAILED"
+        return
+    if verify.get("outcome") == "crashed":
+        # No worse than before, so the patch stays, but the exploit still works
+        log_critical_path(mission)
+        log("MISSION COMPLETE. The patched victim still crashes under attack.")
+        mission.phase = "COMPLETE"
+        mission.status = "VULNERABLE"
+        return
 
-    STATE["status"] = "SECURE"
-    STATE["phase"] = "COMPLETE"
+    log_critical_path(mission)
+    mission.status = "SECURE"
+    mission.phase = "COMPLETE"
     log("MISSION COMPLETE. System secured and report logged.")
 
+SCHEDULER = Scheduler(mission_loop)
+
+def get_mission(mission_id):
+    mission = SCHEDULER.missions.get(mission_id)
+    if mission is None:
+        raise HTTPException(status_code=404, detail="Unknown mission")
+    return mission
+
 @app.get("/status")
-def get_status():
-    # ... (Keep your existing telemetry logic) ...
-    return STATE
+async def get_status(since: int = -1):
+    # Legacy single-mission view: the most recently submitted mission.
+    # Pass the last seen `cursor` as ?since= to receive only new log lines.
+    mission = SCHEDULER.latest()
+    return mission.to_dict(since) if mission else IDLE_STATE
+
+@app.get("/missions")
+async def list_missions():
+    return [
+        {"id": m.id, "status": m.status, "phase": m.phase, "current_repo": m.repo_url,
+         "slot": m.slot.index if m.slot else None}
+        for m in SCHEDULER.missions.values()
+    ]
+
+@app.get("/missions/{mission_id}/status")
+async def mission_status(mission_id: str, since: int = -1):
+    mission = get_mission(mission_id)
+    return {**mission.to_dict(since), "queue_position": SCHEDULER.queue_position(mission)}
+
+@app.get("/missions/{mission_id}/events")
+async def mission_events(mission_id: str, request: Request,
+                         last_event_id: Optional[int] = Header(None)):
+    """
+    Server-Sent Events stream of log/phase/status/telemetry events.
+    Reconnecting clients send Last-Event-ID and resume where they left off.
+    """
+    mission = get_mission(mission_id)
+    start = -1 if last_event_id is None else last_event_id
+
+    async def stream():
+        yield "retry: 2000\n\n"
+        async for event in mission.events.subscribe(start):
+            if event is None:
+                if await request.is_disconnected():
+                    return
+                yield ": ping\n\n"
+                continue
+            event_id, kind, data = event
+            yield f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+        yield f"event: end\ndata: {json.dumps({'status': mission.status})}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape target: mission, phase, step and LLM call histograms/counters."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/missions/{mission_id}/telemetry")
+async def mission_telemetry(mission_id: str, points: int = 120):
+    """Downsampled victim resource series plus per-phase peak/p95 aggregates."""
+    mission = get_mission(mission_id)
+    if mission.collector is None:
+        return {"series": [], "phases": {}}
+    return {"series": mission.collector.series(points), "phases": mission.collector.phase_stats()}
+
+@app.post("/missions/{mission_id}/cancel")
+async def cancel_mission(mission_id: str):
+    mission = get_mission(mission_id)
+    if not mission.active:
+        raise HTTPException(status_code=409, detail=f"Mission is {mission.status}")
+    SCHEDULER.cancel(mission)
+    return {"message": "Cancelling", "mission_id": mission.id}
 
 @app.post("/deploy")
-def deploy_agent(request: DeployRequest, background_tasks: BackgroundTasks):
-    if STATE["status"] != "RUNNING":
-        # Pass the user_id (can be None) to the loop
-        background_tasks.add_task(mission_loop, request.repo_url, request.user_id)
-        return {"message": "Deployed"}
-    return {"message": "Busy"}
\ No newline at end of file
+async def deploy_agent(request: DeployRequest):
+    # Pass the user_id (can be None) to the loop
+    mission = SCHEDULER.submit(request.repo_url, request.user_id, request.ref)
+    return {"message": "Deployed", "mission_id": mission.id,
+            "queue_position": SCHEDULER.queue_position(mission)}
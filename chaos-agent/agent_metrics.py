@@ -0,0 +1,53 @@
+import io
+import json
+import sys
+import threading
+import time
+
+# Structured measurements ride along the normal output stream as single lines the
+# orchestrator picks out (and keeps out of the mission log): "[METRIC] {json}".
+PREFIX = "[METRIC] "
+OUTPUT_LOCK = threading.Lock()  # held while a complete line is handed on, by every LineWriter
+
+
+class LineWriter(io.TextIOBase):
+    """
+    stdout wrapper for phases that print from worker threads. Each thread's text is held
+    until its line is complete and then passed on whole under OUTPUT_LOCK, so print()'s
+    separate newline write can't split another thread's line (or a metric) in two.
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        pending = getattr(self.local, "pending", "") + text
+        *lines, self.local.pending = pending.split("\n")
+        if lines:
+            with OUTPUT_LOCK:
+                self.send(lines)
+        return len(text)
+
+    def send(self, lines):
+        self.stream.write("".join(line + "\n" for line in lines))
+        self.stream.flush()
+
+    def flush(self):
+        self.stream.flush()
+
+
+def emit(kind, **fields):
+    # A whole line per write; under a LineWriter it reaches the orchestrator intact
+    sys.stdout.write(PREFIX + json.dumps({"kind": kind, **fields}) + "\n")
+    sys.stdout.flush()
+
+
+def llm_call(component, model, started=None, response=None, outcome="ok", **extra):
+    """Reports one model call: latency since `started` (time.monotonic) and token usage."""
+    usage = getattr(response, "usage_metadata", None)
+    emit("llm", component=component, model=model, outcome=outcome,
+         seconds=round(time.monotonic() - started, 3) if started is not None else None,
+         prompt_tokens=getattr(usage, "prompt_token_count", None) or 0,
+         output_tokens=getattr(usage, "candidates_token_count", None) or 0,
+         thinking_tokens=getattr(usage, "thoughts_token_count", None) or 0, **extra)
@@ -0,0 +1,193 @@
+"""
+Long-lived agent daemon: the container's main process instead of `tail -f /dev/null`.
+
+Phases run inside this one interpreter, so google.genai, aiohttp and the Gemini client
+are imported and built once instead of on every `docker exec python ...`. The protocol
+is the same JSON-lines style as distributed.py: a client sends
+{"phase": "strategize"|"attack"|"heal", "env": {...}} and receives one
+{"type": "line", "text": ...} message per printed line, then {"type": "exit", "code": N}.
+Different phases may run at once (an attack following a plan that's still being
+streamed); each phase runs one at a time. Closing the connection cancels the phase; a
+sync phase can't be interrupted, so its lock is held until its thread has returned.
+"""
+import asyncio
+import contextvars
+import hmac
+import importlib
+import io
+import json
+import os
+import sys
+import traceback
+
+from agent_metrics import LineWriter, OUTPUT_LOCK
+
+# CONFIGURATION
+PORT = int(os.getenv("AGENT_SERVER_PORT", "7000"))
+# Every request must carry this. The port is reachable from the victim's network, and
+# the victim runs code from whatever repo was cloned; without a token there's no daemon.
+TOKEN = os.getenv("AGENT_TOKEN", "")
+PHASES = {
+    "strategize": ("strategist", "analyze_code"),
+    "attack": ("attacker", "main"),
+    "heal": ("healer", "heal_code"),
+}
+# Per-run settings the phase modules read once at import: (env var, module, attribute, default)
+SETTINGS = [
+    ("USER_ID", "strategist", "user_id", None),
+    ("PLAN_RUN", "strategist", "PLAN_RUN", None),
+    ("ATTACK_REPORT", "attacker", "REPORT_FILE", "attack_report.json"),
+    ("ATTACK_FOLLOW", "attacker", "FOLLOW_PLAN", "off"),
+    ("PLAN_RUN", "attacker", "PLAN_RUN", None),
+]
+LOCKS = {phase: asyncio.Lock() for phase in PHASES}
+# Where print() goes for the phase running in the current context (threads get a copy)
+OUTPUT = contextvars.ContextVar("output", default=None)
+
+
+class LineStream(LineWriter):
+    """Phase output: complete lines, assembled per thread, are handed to the event loop."""
+
+    def __init__(self, loop, queue):
+        super().__init__()
+        self.loop = loop
+        self.queue = queue
+
+    def send(self, lines):
+        for line in lines:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, line)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        with OUTPUT_LOCK:
+            pending, self.local.pending = getattr(self.local, "pending", ""), ""
+            self.send([pending] if pending else [])
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+class RoutedStream(io.TextIOBase):
+    """Installed as sys.stdout/stderr: writes go to the calling phase's LineStream, or the console."""
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def write(self, text):
+        return (OUTPUT.get() or self.fallback).write(text)
+
+    def flush(self):
+        (OUTPUT.get() or self.fallback).flush()
+
+
+def apply_settings(phase, env):
+    # Only the phase's own module: another phase may be running with different settings
+    for var, module_name, attribute, default in SETTINGS:
+        module = sys.modules.get(module_name)
+        if module is not None and module_name == PHASES[phase][0]:
+            setattr(module, attribute, env.get(var, os.getenv(var, default)))
+
+
+async def run_in_thread(target):
+    """
+    to_thread() that doesn't give up on the thread when cancelled: the cancellation is
+    only raised once the thread has returned, so the caller keeps the phase lock until
+    nothing of this run is left touching module globals or the plan/report files.
+    """
+    worker = asyncio.ensure_future(asyncio.to_thread(target))
+    cancelled = False
+    while True:
+        try:
+            result = await asyncio.shield(worker)
+            break
+        except asyncio.CancelledError:
+            if worker.done():
+                raise
+            if not cancelled:
+                print("Phase cancelled; waiting for its worker thread to finish...")
+            cancelled = True
+    if cancelled:
+        raise asyncio.CancelledError
+    return result
+
+
+async def execute(phase, env, stream):
+    """Runs one phase with its output captured. Returns a process-style exit code."""
+    module_name, entry = PHASES[phase]
+    OUTPUT.set(stream)  # this task's context only; to_thread carries it into the worker
+    try:
+        target = getattr(importlib.import_module(module_name), entry)
+        apply_settings(phase, env)
+        if asyncio.iscoroutinefunction(target):
+            await target()
+        else:
+            await run_in_thread(target)
+        return 0
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        stream.finish()
+
+
+async def handle(reader, writer):
+    async def send(message):
+        writer.write((json.dumps(message) + "\n").encode())
+        await writer.drain()
+
+    try:
+        request = json.loads(await reader.readline())
+        if not hmac.compare_digest(str(request.get("token") or ""), TOKEN):
+            await send({"type": "exit", "code": 2, "error": "unauthorized"})
+            return
+        if request.get("phase") == "ping":
+            await send({"type": "exit", "code": 0})  # readiness check from the orchestrator
+            return
+        if request.get("phase") not in PHASES:
+            await send({"type": "exit", "code": 2, "error": f"unknown phase {request.get('phase')!r}"})
+            return
+        async with LOCKS[request["phase"]]:
+            queue = asyncio.Queue()
+            stream = LineStream(asyncio.get_running_loop(), queue)
+            task = asyncio.create_task(execute(request["phase"], request.get("env") or {}, stream))
+            try:
+                while (line := await queue.get()) is not None:
+                    await send({"type": "line", "text": line})
+                await send({"type": "exit", "code": await task})
+            except (ConnectionError, OSError):
+                # Client went away (step timeout, mission cancelled): stop the phase too
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+    except (ConnectionError, ValueError) as e:
+        print(f"Agent request failed: {e}")
+    finally:
+        writer.close()
+
+
+def warm_up():
+    """Imports the phase modules up front so the first request doesn't pay for it."""
+    for module_name, _ in PHASES.values():
+        try:
+            importlib.import_module(module_name)
+        except (Exception, SystemExit) as e:
+            # e.g. no GEMINI_API_KEY yet; the phase reports it when it's actually requested
+            print(f"Warm-up skipped {module_name}: {e!r}")
+
+
+async def serve(port=PORT):
+    sys.stdout, sys.stderr = RoutedStream(sys.stdout), RoutedStream(sys.stderr)
+    if not TOKEN:
+        # Stay up as the container's main process; phases run with docker exec instead
+        print("AGENT_TOKEN not set: agent daemon disabled.")
+        await asyncio.Event().wait()
+    warm_up()
+    server = await asyncio.start_server(handle, "0.0.0.0", port)
+    print(f"Agent daemon listening on :{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(serve())
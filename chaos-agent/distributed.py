@@ -0,0 +1,173 @@
+"""
+Coordinator/worker load generation across processes and agent containers.
+
+Every worker speaks the same JSON-lines protocol: it reads one job line, waits for the
+job's shared `start_at` instant, fires its share of the load and streams cumulative
+AttackStats snapshots back, ending with a "done" line. Local workers are child
+processes talking over stdin/stdout (`python distributed.py work`); remote agents run
+`python distributed.py serve` and talk over TCP on entropy-net.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+from histogram import AttackStats
+from loadgen import LoadEngine
+
+# CONFIGURATION
+LOCAL_WORKERS = int(os.getenv("DIST_WORKERS", "0"))  # child processes on this agent
+REMOTE_WORKERS = [w.strip() for w in os.getenv("AGENT_WORKERS", "").split(",") if w.strip()]  # host:port
+SERVE_PORT = int(os.getenv("DIST_PORT", "7071"))
+START_LEAD = float(os.getenv("DIST_START_LEAD", "2.0"))  # seconds for every worker to be ready
+STREAM_INTERVAL = float(os.getenv("DIST_STREAM_INTERVAL", "0.5"))
+
+
+def enabled():
+    return LOCAL_WORKERS > 0 or bool(REMOTE_WORKERS)
+
+
+def split(value, parts):
+    """Splits an integer as evenly as possible: split(10, 3) -> [4, 3, 3]."""
+    return [value // parts + (1 if i < value % parts else 0) for i in range(parts)]
+
+
+# --- worker side ---
+
+async def run_job(job, emit):
+    """Executes one job share and calls `emit(message)` with progress and the final stats."""
+    kwargs = dict(job.get("kwargs", {}))
+    if "data_bytes" in kwargs:
+        # Payloads are described, not shipped, so 1MB bodies don't cross the wire per worker
+        kwargs["data"] = "A" * kwargs.pop("data_bytes")
+    stats = AttackStats(job["name"], job["path"])
+    concurrency = max(1, job["concurrency"])
+    async with LoadEngine(job["base_url"], concurrency=concurrency, pool_size=concurrency) as engine:
+        # Sleep most of the way, then spin for the last few ms to line up the start
+        while (delay := job["start_at"] - time.time()) > 0.005:
+            await asyncio.sleep(delay - 0.005)
+        while time.time() < job["start_at"]:
+            pass
+
+        run = asyncio.create_task(engine.run(job["method"], job["path"], job["total"],
+                                             concurrency=concurrency, rate=job.get("rate") or 0,
+                                             stats=stats, **kwargs))
+        while not run.done():
+            await asyncio.wait({run}, timeout=STREAM_INTERVAL)
+            if not run.done():
+                await emit({"type": "stats", "stats": stats.to_dict()})
+        run.result()
+    await emit({"type": "done", "stats": stats.to_dict()})
+
+
+async def work_stdio():
+    """`python distributed.py work`: one job from stdin, progress on stdout."""
+    job = json.loads(sys.stdin.readline())
+
+    async def emit(message):
+        sys.stdout.write(json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+    await run_job(job, emit)
+
+
+async def serve(port=SERVE_PORT):
+    """`python distributed.py serve`: accept jobs from remote coordinators over TCP."""
+    async def handle(reader, writer):
+        try:
+            job = json.loads(await reader.readline())
+
+            async def emit(message):
+                writer.write((json.dumps(message) + "\n").encode())
+                await writer.drain()
+
+            await run_job(job, emit)
+        except (ConnectionError, ValueError) as e:
+            print(f"Worker job failed: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "0.0.0.0", port)
+    print(f"Load worker listening on :{port}")
+    async with server:
+        await server.serve_forever()
+
+
+# --- coordinator side ---
+
+async def _drive_local(job, on_message):
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "work",
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    proc.stdin.write((json.dumps(job) + "\n").encode())
+    await proc.stdin.drain()
+    proc.stdin.close()
+    async for line in proc.stdout:
+        on_message(json.loads(line))
+    await proc.wait()
+
+
+async def _drive_remote(address, job, on_message):
+    host, _, port = address.rpartition(":")
+    reader, writer = await asyncio.open_connection(host, int(port))
+    writer.write((json.dumps(job) + "\n").encode())
+    await writer.drain()
+    async for line in reader:
+        on_message(json.loads(line))
+    writer.close()
+
+
+async def run_distributed(base_url, name, method, path, total, concurrency, rate=0, kwargs=None):
+    """
+    Fans one attack out over all configured workers, starts them at the same instant and
+    merges their streamed stats. Returns the merged AttackStats.
+    """
+    targets = [("local", i) for i in range(LOCAL_WORKERS)] + [("remote", w) for w in REMOTE_WORKERS]
+    n = len(targets)
+    start_at = time.time() + START_LEAD
+    totals, slots = split(total, n), split(max(concurrency, n), n)
+    latest = {}
+    print(f"      -> Distributing {total} requests over {n} worker(s), start in {START_LEAD:g}s...")
+
+    def collector(worker_id):
+        def on_message(message):
+            latest[worker_id] = AttackStats.from_dict(message["stats"])
+        return on_message
+
+    async def progress():
+        while True:
+            await asyncio.sleep(1)
+            done = sum(s.requests for s in latest.values())
+            print(f"      -> {done}/{total} requests across {len(latest)}/{n} worker(s)")
+
+    drivers = []
+    for i, (kind, where) in enumerate(targets):
+        job = {"name": name, "base_url": base_url, "method": method, "path": path,
+               "total": totals[i], "concurrency": slots[i], "rate": rate / n if rate else 0,
+               "kwargs": kwargs or {}, "start_at": start_at}
+        if kind == "local":
+            drivers.append(_drive_local(job, collector(i)))
+        else:
+            drivers.append(_drive_remote(where, job, collector(i)))
+
+    ticker = asyncio.create_task(progress())
+    try:
+        results = await asyncio.gather(*drivers, return_exceptions=True)
+    finally:
+        ticker.cancel()
+    for (kind, where), result in zip(targets, results):
+        if isinstance(result, Exception):
+            print(f"      -> Worker {kind}:{where} failed: {result}")
+
+    merged = AttackStats(name, path)
+    for stats in latest.values():
+        merged.merge(stats)
+    return merged
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "serve"
+    asyncio.run(work_stdio() if mode == "work" else serve())
@@ -1,72 +1,174 @@
 import os
-from google import genai
 import json
-import time
+import sys
+import contextvars
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+from llm_cache import LLMCache
+import agent_metrics
+import llm_client
+import patching
 
 # CONFIGURATION
-API_KEY = os.environ.get("GEMINI_API_KEY")
-CLIENT = genai.Client(api_key=API_KEY)
-TARGET_FILE = "/target-code/src/main/java/com/entropy/victim/VulnerableController.java"
+TARGET_DIR = os.getenv("TARGET_DIR", "/target-code")
+# Used for findings that don't name their source file (plans from before source_file existed)
+DEFAULT_FILE = os.getenv("HEAL_DEFAULT_FILE", "src/main/java/com/entropy/victim/VulnerableController.java")
 PLAN_FILE = "attack_plan.json"
+MODEL = "gemini-3-flash-preview"
+CACHE = LLMCache("healer")
+MAX_IN_FLIGHT = int(os.getenv("HEAL_MAX_IN_FLIGHT", "4"))  # files patched concurrently
+VALIDATORS = int(os.getenv("HEAL_VALIDATORS", str(min(4, os.cpu_count() or 1))))  # build-check processes
+ATTEMPTS = int(os.getenv("HEAL_ATTEMPTS", "2"))  # a rejected diff is retried once with the reason
+
+# The "Senior Engineer" Prompt
+PROMPT_TEMPLATE = """
+    You are a Lead Software Architect.
+    Our Red Team found the vulnerabilities below in one file of a Java Spring Boot service.
+
+    VULNERABILITY REPORT:
+    {findings}
+
+    SOURCE CODE ({path}):
+    {code}
+    {feedback}
+    TASK:
+    Fix every reported vulnerability with the smallest change that does it. Keep the
+    public API (paths, signatures) unchanged and don't touch unrelated code.
+
+    OUTPUT:
+    Return ONLY a unified diff against the file above: "--- a/{path}" and "+++ b/{path}"
+    headers, then "@@" hunks with 3 lines of unchanged context, copied exactly.
+    No Markdown formatting, no explanations.
+    """
+
+FEEDBACK_TEMPLATE = """
+    YOUR PREVIOUS DIFF WAS REJECTED:
+    {reason}
+    """
 
 def read_file(path):
     with open(path, "r") as f:
         return f.read()
 
-def write_file(path, content):
-    with open(path, "w") as f:
-        f.write(content)
+def source_path(card):
+    """The finding's file relative to TARGET_DIR, or None when it can't be located."""
+    path = card.get("source_file") or DEFAULT_FILE
+    if os.path.isabs(path):
+        path = os.path.relpath(path, TARGET_DIR)
+    path = os.path.normpath(path)
+    if path.startswith("..") or not os.path.isfile(os.path.join(TARGET_DIR, path)):
+        return None
+    return path
+
+def group_findings(cards):
+    """{relative path: [cards]} for every finding whose file exists."""
+    groups = defaultdict(list)
+    for card in cards:
+        if not isinstance(card, dict):
+            continue
+        path = source_path(card)
+        if path is None:
+            print(f"   [?] {card.get('name')}: source file {card.get('source_file')!r} not found, skipping")
+            continue
+        groups[path].append(card)
+    return groups
+
+def request_diff(path, code, findings, reason=None):
+    prompt = PROMPT_TEMPLATE.format(findings=findings, path=path, code=code,
+                                    feedback=FEEDBACK_TEMPLATE.format(reason=reason) if reason else "")
+    text = llm_client.generate("healer", prompt, MODEL)
+    return text.replace("```diff", "").replace("```", "").strip()
+
+def heal_file(path, cards, validators):
+    """
+    Gets a validated patch for one file. Returns (path, patched code or None, diff stats).
+    Runs in a thread; the build check goes to the `validators` process pool.
+    """
+    code = read_file(os.path.join(TARGET_DIR, path))
+    findings = json.dumps([{k: c.get(k) for k in ("name", "type", "trigger_endpoint", "fix_explanation")}
+                           for c in cards], indent=2)
+    key = CACHE.key(PROMPT_TEMPLATE, MODEL, path, code, findings)
+    cached = CACHE.get(key)
+    if cached is not None:
+        print(f"   {path}: cached patch for this exact code + findings. Skipping Gemini.")
+        agent_metrics.llm_call("healer", MODEL, outcome="cached")
+        return path, patching.apply_diff(code, cached), cached
+
+    reason = None
+    for attempt in range(ATTEMPTS):
+        print(f"   {path}: requesting a diff for {len(cards)} finding(s)"
+              + (f" (attempt {attempt + 1}, previous rejected)" if reason else ""))
+        diff = request_diff(path, code, findings, reason)
+        try:
+            patched = patching.apply_diff(code, diff)
+        except patching.PatchError as e:
+            reason = f"The diff did not apply: {e}"
+            print(f"   {path}: {reason}")
+            continue
+        reason = validators.submit(patching.validate, TARGET_DIR, {path: patched}).result()
+        if reason is None:
+            CACHE.put(key, diff)
+            return path, patched, diff
+        print(f"   {path}: candidate failed validation:\n      " + reason.replace("\n", "\n      "))
+    return path, None, None
 
 def heal_code():
     print("STARTING HEALING PROTOCOL...")
-    
+
     if not os.path.exists(PLAN_FILE):
         print("No attack plan found. Nothing to fix.")
         return
 
-    # 1. Load the Context
-    java_code = read_file(TARGET_FILE)
-    attack_plan = read_file(PLAN_FILE)
+    # 1. Load the Context, one group of findings per source file
+    with open(PLAN_FILE) as f:
+        groups = group_findings(json.load(f))
+    if not groups:
+        print("No finding points at a source file we can patch.")
+        return
+    print(f"{sum(len(c) for c in groups.values())} finding(s) across {len(groups)} file(s).")
 
-    print("Sending Code + Vulnerabilities to Gemini 3...")
+    # 2. Ask for a minimal diff per file, concurrently; each candidate is build-checked in a
+    #    separate process before it's accepted. Spawned workers keep the daemon's threads out.
+    patches = {}
+    with ProcessPoolExecutor(max_workers=VALIDATORS, mp_context=multiprocessing.get_context("spawn")) as validators, \
+            ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT) as pool:
+        # Each worker runs in a copy of our context so output capture follows it
+        futures = [pool.submit(contextvars.copy_context().run, heal_file, path, cards, validators)
+                   for path, cards in groups.items()]
+        for future in futures:
+            try:
+                path, patched, diff = future.result()
+            except llm_client.LLMError as e:
+                print(f"[ERROR] {e}")
+                continue
+            if patched is not None:
+                changed = sum(1 for line in diff.splitlines() if line[:1] in "+-" and line[:3] not in ("+++", "---"))
+                print(f"   {path}: patch accepted ({changed} changed line(s)).")
+                patches[path] = patched
 
-    # 2. The "Senior Engineer" Prompt
-    prompt = f"""
-    You are a Lead Software Architect.
-    I have a Java Spring Boot file that has specific vulnerabilities detected by our Red Team.
-    
-    VULNERABILITY REPORT:
-    {attack_plan}
-    
-    SOURCE CODE:
-    {java_code}
-    
-    TASK:
-    Rewrite the ENTIRE 'VulnerableController.java' file to fix all 3 detected issues.
-    1. Fix the Memory Leak (Use a limited collection or remove the log).
-    2. Fix the Race Condition (Use AtomicInteger or synchronized blocks).
-    3. Fix the DoS/CPU issue (Add input validation for 'iterations').
-    
-    OUTPUT:
-    Return ONLY the Java code. No markdown formatting, no explanations. 
-    Just the raw code ready to compile.
-    """
+        # 3. Patches were checked one file at a time; make sure they also build together
+        if len(patches) > 1:
+            reason = validators.submit(patching.validate, TARGET_DIR, patches).result()
+            if reason is not None:
+                print(f"Patches don't build together, applying none:\n{reason}")
+                exit(1)
+    print(CACHE.stats())
+
+    if not patches:
+        print("No patch passed validation. Source left untouched.")
+        exit(1)
+    rejected = len(groups) - len(patches)
+    if rejected:
+        print(f"[WARN] {rejected} file(s) left unpatched.")
+
+    # 4. Apply the Patch set (all or nothing)
+    print(f"Applying {len(patches)} patch(es) to file system...")
+    patching.write_atomically(TARGET_DIR, patches)
 
-    # 3. Call Gemini (Using Flash for speed)
-    response = CLIENT.models.generate_content(
-        model='gemini-3-flash-preview',
-        contents=prompt
-    )
-    
-    # 4. Clean the output (Remove ```java if Gemini adds it)
-    fixed_code = response.text.replace("```java", "").replace("```", "").strip()
-
-    # 5. Apply the Patch
-    print("Patch received. Applying to file system...")
-    write_file(TARGET_FILE, fixed_code)
-    
-    print("FILE PATCHED SUCCESSFULLY!")
+    print("FILES PATCHED SUCCESSFULLY!")
     print("The Victim App needs to be restarted to load the new byte-code.")
 
 if __name__ == "__main__":
-    heal_code()
\ No newline at end of file
+    sys.stdout = agent_metrics.LineWriter(sys.stdout)  # batches print from worker threads
+    heal_code()
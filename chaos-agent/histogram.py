@@ -0,0 +1,176 @@
+import time
+
+# HDR-style log-linear bucketing: every power-of-two range is split into HALF linear
+# sub-buckets, so any recorded value is known to within 1/HALF (~1.6%) of itself while
+# recording stays a couple of integer ops and a dict increment.
+SUB_BUCKET_BITS = 7
+HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+
+def bucket_index(value):
+    if value < 2 * HALF:
+        return value
+    magnitude = value.bit_length() - SUB_BUCKET_BITS
+    return (magnitude + 1) * HALF + (value >> magnitude) - HALF
+
+
+def bucket_value(index):
+    """Midpoint of the value range covered by a bucket."""
+    if index < 2 * HALF:
+        return index
+    magnitude = index // HALF - 1
+    low = (index % HALF + HALF) << magnitude
+    return low + ((1 << magnitude) >> 1)
+
+
+class LatencyHistogram:
+    """Mergeable latency histogram in microseconds with ~1.6% worst-case value error."""
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.sum = 0
+
+    def record(self, seconds):
+        us = max(1, int(seconds * 1_000_000))
+        index = bucket_index(us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += us
+        self.max = max(self.max, us)
+        self.min = us if self.min is None else min(self.min, us)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        return self
+
+    def percentile(self, pct):
+        """Value (us) at the given percentile, or None when empty."""
+        if not self.total:
+            return None
+        rank = max(1, int(round(pct / 100 * self.total)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_value(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {"counts": {str(k): v for k, v in self.counts.items()}, "total": self.total,
+                "min": self.min, "max": self.max, "sum": self.sum}
+
+    @classmethod
+    def from_dict(cls, data):
+        h = cls()
+        h.counts = {int(k): v for k, v in data["counts"].items()}
+        h.total, h.min, h.max, h.sum = data["total"], data["min"], data["max"], data["sum"]
+        return h
+
+
+class AttackStats:
+    """Per-attack throughput, latency and error accounting fed by LoadEngine results."""
+
+    def __init__(self, name, endpoint):
+        self.name = name
+        self.endpoint = endpoint
+        self.latency = LatencyHistogram()
+        self.ok = 0
+        self.http_errors = {}
+        self.timeouts = 0
+        self.connection_errors = 0
+        self.started = None
+        self.finished = None
+
+    def record(self, res):
+        now = time.time()
+        self.started = self.started or now - res.latency
+        self.finished = now
+        if res.error == "timeout":
+            self.timeouts += 1
+        elif res.error:
+            self.connection_errors += 1
+        else:
+            # Only completed responses go into the latency distribution
+            self.latency.record(res.latency)
+            if res.status < 400:
+                self.ok += 1
+            else:
+                self.http_errors[res.status] = self.http_errors.get(res.status, 0) + 1
+
+    def merge(self, other):
+        self.latency.merge(other.latency)
+        self.ok += other.ok
+        for status, count in other.http_errors.items():
+            self.http_errors[status] = self.http_errors.get(status, 0) + count
+        self.timeouts += other.timeouts
+        self.connection_errors += other.connection_errors
+        starts = [t for t in (self.started, other.started) if t]
+        ends = [t for t in (self.finished, other.finished) if t]
+        self.started = min(starts) if starts else None
+        self.finished = max(ends) if ends else None
+        return self
+
+    def to_dict(self):
+        return {"name": self.name, "endpoint": self.endpoint, "latency": self.latency.to_dict(),
+                "ok": self.ok, "http_errors": {str(k): v for k, v in self.http_errors.items()},
+                "timeouts": self.timeouts, "connection_errors": self.connection_errors,
+                "started": self.started, "finished": self.finished}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["name"], data["endpoint"])
+        stats.latency = LatencyHistogram.from_dict(data["latency"])
+        stats.ok = data["ok"]
+        stats.http_errors = {int(k): v for k, v in data["http_errors"].items()}
+        stats.timeouts = data["timeouts"]
+        stats.connection_errors = data["connection_errors"]
+        stats.started, stats.finished = data["started"], data["finished"]
+        return stats
+
+    @property
+    def requests(self):
+        return self.ok + sum(self.http_errors.values()) + self.timeouts + self.connection_errors
+
+    @property
+    def error_rate(self):
+        return (self.requests - self.ok) / self.requests if self.requests else 0.0
+
+    def report(self):
+        duration = (self.finished - self.started) if self.started else 0.0
+
+        def ms(pct):
+            value = self.latency.percentile(pct)
+            return None if value is None else round(value / 1000, 2)
+
+        return {
+            "name": self.name,
+            "endpoint": self.endpoint,
+            "requests": self.requests,
+            "ok": self.ok,
+            "http_errors": {str(k): v for k, v in sorted(self.http_errors.items())},
+            "timeouts": self.timeouts,
+            "connection_errors": self.connection_errors,
+            "error_rate": round(self.error_rate, 4),
+            "duration_s": round(duration, 3),
+            "rps": round(self.requests / duration, 1) if duration > 0 else None,
+            "latency_ms": {"p50": ms(50), "p90": ms(90), "p99": ms(99),
+                           "max": round(self.latency.max / 1000, 2) if self.latency.total else None},
+            "histogram": self.latency.to_dict(),
+        }
+
+    def summary(self):
+        r = self.report()
+        lat = r["latency_ms"]
+        return (f"      -> {r['requests']} req in {r['duration_s']}s ({r['rps']} rps) | "
+                f"p50={lat['p50']}ms p90={lat['p90']}ms p99={lat['p99']}ms max={lat['max']}ms | "
+                f"ok {r['ok']}, http err {sum(self.http_errors.values())}, "
+                f"timeout {r['timeouts']}, conn {r['connection_errors']}")
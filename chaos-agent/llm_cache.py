@@ -0,0 +1,116 @@
+import hashlib
+import itertools
+import json
+import os
+import tempfile
+import time
+
+# CONFIGURATION
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm-cache")
+MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024
+MAX_AGE = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30")) * 86400
+DISABLED = os.getenv("LLM_CACHE", "on").lower() in ("0", "off", "false")
+EVICT_EVERY = int(os.getenv("LLM_CACHE_EVICT_EVERY", "32"))  # puts between eviction sweeps
+
+
+class LLMCache:
+    """
+    Content-addressed on-disk cache for parsed model responses.
+    Keys hash everything that determines the answer (prompt template, model, source),
+    so an unchanged repo hits and any edit misses. Entries are evicted least-recently-used
+    once the cache exceeds MAX_BYTES, and unconditionally after MAX_AGE.
+    """
+
+    def __init__(self, namespace, directory=CACHE_DIR, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.namespace = namespace
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.puts = itertools.count()  # next() is atomic, and puts come from worker threads
+
+    def key(self, *parts):
+        h = hashlib.sha256(self.namespace.encode())
+        for part in parts:
+            data = part.encode() if isinstance(part, str) else part
+            # Length prefix so ("ab", "c") and ("a", "bc") can't collide
+            h.update(len(data).to_bytes(8, "big"))
+            h.update(data)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        if DISABLED:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "r") as f:
+                value = json.load(f)["value"]
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        # Touch on read: mtime doubles as the LRU clock
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if DISABLED:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per writer: threads of one process may put the same key at once.
+        # Not *.json, so a half-written entry is never read or counted by evict()
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"namespace": self.namespace, "created": time.time(), "value": value}, f)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        # Sweeping walks the whole cache: do it on the first put, then every EVICT_EVERY
+        if next(self.puts) % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        entries = []
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue  # temp files, and the rate limiter's ratelimit.state
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if now - st.st_mtime > self.max_age:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass  # another process evicted it first
+                else:
+                    entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        return f"[CACHE] {self.namespace}: {self.hits} hit(s), {self.misses} miss(es)"
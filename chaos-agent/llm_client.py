@@ -0,0 +1,241 @@
+"""
+Shared Gemini access for the strategist and healer.
+
+The client is built on first use, not at import. Every call goes through a token bucket
+(requests and tokens per minute), a bounded in-flight semaphore and jittered retries on
+429/5xx/timeouts. Identical prompts already in flight share a single request, and
+stream() hands text out as it is generated. The bucket state lives on the llm-cache
+volume that every agent container mounts, so a fleet of concurrent missions stays
+inside one API key's quota without being serialised.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+import httpx
+from google import genai
+from google.genai import errors, types
+
+import agent_metrics
+
+# CONFIGURATION
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))  # seconds per attempt
+RETRIES = int(os.getenv("LLM_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))
+BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "30"))
+MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "4"))  # per agent process
+RPM = float(os.getenv("LLM_RPM", "60"))  # shared across every agent using the same state file
+TPM = float(os.getenv("LLM_TPM", "1000000"))
+# On the cache volume, but not named *.json: LLMCache.evict() only counts (and deletes) entries
+STATE_FILE = os.getenv("LLM_RATE_STATE", os.path.join(os.getenv("LLM_CACHE_DIR", ".llm-cache"), "ratelimit.state"))
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    """Model call failed for good (not configured, non-retryable error, or retries exhausted)."""
+
+
+class TokenBucket:
+    """
+    Requests- and tokens-per-minute bucket. State is kept in a flock'd JSON file when the
+    directory exists, so every process sharing it draws from the same quota; otherwise
+    it's per process.
+    """
+
+    def __init__(self, rpm=RPM, tpm=TPM, path=STATE_FILE):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.path = path if os.path.isdir(os.path.dirname(path) or ".") else None
+        self.lock = threading.Lock()
+        self.local = None
+
+    def _update(self, change):
+        """Runs change(state, now) under the lock(s) and persists the state."""
+        with self.lock:
+            if self.path is None:
+                self.local = self.local or {}
+                return change(self.local, time.time())
+            with open(self.path, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    state = json.loads(f.read() or "{}")
+                except ValueError:
+                    state = {}
+                result = change(state, time.time())
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(state))
+                return result
+
+    def _refill(self, state, now):
+        elapsed = now - state.get("updated", now)
+        state["requests"] = min(self.rpm, state.get("requests", self.rpm) + elapsed * self.rpm / 60)
+        state["tokens"] = min(self.tpm, state.get("tokens", self.tpm) + elapsed * self.tpm / 60)
+        state["updated"] = now
+
+    def acquire(self, tokens):
+        """Blocks until one request and `tokens` tokens are available, then takes them."""
+        tokens = min(tokens, self.tpm)  # a prompt larger than the whole budget still gets through
+
+        def take(state, now):
+            self._refill(state, now)
+            blocked = state.get("blocked_until", 0) - now
+            if blocked > 0:
+                return blocked
+            if state["requests"] >= 1 and state["tokens"] >= tokens:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+                return 0
+            return max((1 - state["requests"]) * 60 / self.rpm, (tokens - state["tokens"]) * 60 / self.tpm, 0.05)
+
+        while (wait := self._update(take)) > 0:
+            time.sleep(wait)
+
+    def settle(self, delta):
+        """Corrects the token estimate once the real usage is known."""
+        def apply(state, now):
+            self._refill(state, now)
+            state["tokens"] -= delta
+        self._update(apply)
+
+    def pause(self, seconds):
+        """Quota exceeded: nobody sharing this bucket sends anything for `seconds`."""
+        def apply(state, now):
+            state["blocked_until"] = max(state.get("blocked_until", 0), now + seconds)
+        self._update(apply)
+
+
+BUCKET = TokenBucket()
+IN_FLIGHT = threading.BoundedSemaphore(MAX_IN_FLIGHT)
+_client = None
+_client_lock = threading.Lock()
+_pending = {}  # prompt hash -> Future shared by identical in-flight calls
+_pending_lock = threading.Lock()
+
+
+def configured():
+    # Read at call time: callers may load a .env after importing this module
+    return bool(os.getenv("GEMINI_API_KEY"))
+
+
+def client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            if not configured():
+                raise LLMError("GEMINI_API_KEY not set")
+            _client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"),
+                                   http_options=types.HttpOptions(timeout=int(TIMEOUT * 1000)))
+        return _client
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def retry_delay(error, attempt):
+    """Server-suggested delay (RetryInfo) when there is one, else full-jitter exponential backoff."""
+    hint = re.search(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s", str(error))
+    if hint:
+        return float(hint.group(1)) + random.uniform(0, 1)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def retryable(error):
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_CODES
+    return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+
+def _call(component, model, prompt):
+    estimate = estimate_tokens(prompt)
+    started = time.monotonic()
+    for attempt in range(RETRIES + 1):
+        BUCKET.acquire(estimate)
+        try:
+            with IN_FLIGHT:
+                response = client().models.generate_content(model=model, contents=prompt)
+        except Exception as e:
+            if not retryable(e) or attempt == RETRIES:
+                agent_metrics.llm_call(component, model, started, outcome="error", retries=attempt)
+                raise LLMError(f"{component}: {e}") from e
+            delay = retry_delay(e, attempt)
+            if getattr(e, "code", None) == 429:
+                BUCKET.pause(delay)
+            print(f"[WARN] {component}: model call failed ({e.__class__.__name__}), "
+                  f"retry {attempt + 1}/{RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and usage.total_token_count:
+            BUCKET.settle(usage.total_token_count - estimate)
+        agent_metrics.llm_call(component, model, started, response, retries=attempt)
+        return response.text
+
+
+def generate(component, prompt, model):
+    """
+    Returns the model's text for `prompt`. Safe to call from many threads; concurrent
+    identical prompts are sent once. Raises LLMError when the call can't succeed.
+    """
+    key = hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()
+    with _pending_lock:
+        shared = _pending.get(key)
+        if shared is None:
+            future = _pending[key] = Future()
+    if shared is not None:
+        agent_metrics.llm_call(component, model, outcome="shared")
+        return shared.result()
+
+    try:
+        future.set_result(_call(component, model, prompt))
+    except BaseException as e:
+        future.set_exception(e)
+    finally:
+        with _pending_lock:
+            _pending.pop(key, None)
+    return future.result()
+
+
+def stream(component, prompt, model):
+    """
+    Yields the model's text for `prompt` chunk by chunk. Same limits and retries as
+    generate(), except that once text has been handed out a failure is raised instead of
+    retried (the caller has already consumed part of the answer). Not deduplicated.
+    """
+    estimate = estimate_tokens(prompt)
+    started = time.monotonic()
+    for attempt in range(RETRIES + 1):
+        BUCKET.acquire(estimate)
+        received, last = False, None
+        try:
+            with IN_FLIGHT:
+                for chunk in client().models.generate_content_stream(model=model, contents=prompt):
+                    last = chunk
+                    if chunk.text:
+                        received = True
+                        yield chunk.text
+        except Exception as e:
+            if received or not retryable(e) or attempt == RETRIES:
+                agent_metrics.llm_call(component, model, started, outcome="error", retries=attempt)
+                raise LLMError(f"{component}: {e}") from e
+            delay = retry_delay(e, attempt)
+            if getattr(e, "code", None) == 429:
+                BUCKET.pause(delay)
+            print(f"[WARN] {component}: model stream failed ({e.__class__.__name__}), "
+                  f"retry {attempt + 1}/{RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        # Usage metadata arrives with the final chunk
+        usage = getattr(last, "usage_metadata", None)
+        if usage is not None and usage.total_token_count:
+            BUCKET.settle(usage.total_token_count - estimate)
+        agent_metrics.llm_call(component, model, started, last, retries=attempt, streamed=True)
+        return
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+
+import aiohttp
+
+# CONFIGURATION
+# Every attack shares one engine so connections are pooled and kept alive
+# instead of paying a fresh TCP handshake per request.
+DEFAULT_CONCURRENCY = int(os.getenv("ATTACK_CONCURRENCY", "50"))
+DEFAULT_RATE = float(os.getenv("ATTACK_RATE", "0"))  # requests/sec, 0 = unthrottled
+POOL_SIZE = int(os.getenv("ATTACK_POOL_SIZE", "100"))
+KEEPALIVE_SECONDS = float(os.getenv("ATTACK_KEEPALIVE", "30"))
+REQUEST_TIMEOUT = float(os.getenv("ATTACK_TIMEOUT", "5"))
+
+
+class Result:
+    """Outcome of a single request fired by the engine."""
+
+    __slots__ = ("index", "status", "body", "error", "latency")
+
+    def __init__(self, index, status=None, body=None, error=None, latency=0.0):
+        self.index = index
+        self.status = status
+        self.body = body
+        self.error = error
+        self.latency = latency
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class LoadEngine:
+    """Async HTTP engine with a bounded keep-alive pool, a concurrency cap and a target rate."""
+
+    def __init__(self, base_url, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                 pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.rate = rate
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            keepalive_timeout=KEEPALIVE_SECONDS,
+            force_close=False,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        self.session = None
+
+    async def request(self, method, path, index=0, timeout=None, read_body=False, **kwargs):
+        """Fires one request and never raises; failures are recorded on the Result."""
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        start = time.perf_counter()
+        try:
+            async with self.session.request(method, f"{self.base_url}{path}", **kwargs) as r:
+                body = await r.text() if read_body else await r.read()
+                return Result(index, status=r.status, body=body if read_body else None,
+                              latency=time.perf_counter() - start)
+        except asyncio.TimeoutError:
+            return Result(index, error="timeout", latency=time.perf_counter() - start)
+        except aiohttp.ClientError as e:
+            return Result(index, error=f"connection: {e}", latency=time.perf_counter() - start)
+
+    async def run(self, method, path, total, concurrency=None, rate=None,
+                  on_result=None, stop_on_error=False, stats=None, **kwargs):
+        """
+        Sends `total` requests with at most `concurrency` in flight, paced to `rate` req/s.
+        `on_result` is called for every completed request and every Result is recorded
+        into `stats` (an AttackStats) when given. Returns the list of Results.
+        """
+        concurrency = concurrency or self.concurrency
+        rate = self.rate if rate is None else rate
+        sem = asyncio.Semaphore(concurrency)
+        stop = asyncio.Event()
+        results = []
+        start = time.perf_counter()
+
+        async def fire(i):
+            if rate:
+                # Open-loop pacing: request i is due at start + i/rate
+                delay = start + i / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            async with sem:
+                if stop.is_set():
+                    return
+                res = await self.request(method, path, index=i, **kwargs)
+                results.append(res)
+                if stats is not None:
+                    stats.record(res)
+                if on_result:
+                    on_result(res)
+                if stop_on_error and not res.ok:
+                    stop.set()
+
+        await asyncio.gather(*(fire(i) for i in range(total)))
+        results.sort(key=lambda r: r.index)
+        return results
+
+    async def health(self, timeout=2):
+        res = await self.request("GET", "/api/health", timeout=timeout)
+        return res.ok and res.status == 200
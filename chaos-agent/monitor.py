@@ -0,0 +1,173 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from histogram import LatencyHistogram
+from loadgen import LoadEngine
+
+# CONFIGURATION
+INTERVAL = float(os.getenv("MONITOR_INTERVAL", "0.1"))  # seconds between probe rounds
+PROBE_TIMEOUT = float(os.getenv("MONITOR_TIMEOUT", "1"))
+BASELINE_SECONDS = float(os.getenv("MONITOR_BASELINE", "2"))  # quiet probing before the first attack
+BYSTANDERS = [e.strip() for e in os.getenv("BYSTANDER_ENDPOINTS", "").split(",") if e.strip()]
+MAX_PROBES = int(os.getenv("MONITOR_MAX_PROBES", "200000"))
+HEALTH = "/api/health"
+BASELINE = "baseline"
+OVERLAP = " + "  # joins the labels of attacks running at the same time
+
+
+class HealthMonitor:
+    """
+    Probes /api/health (and any bystander endpoints) on a fixed cadence for the whole run,
+    on its own small connection pool so attack load can't queue the probes. Every probe is
+    tagged with the attack running at the time, which yields downtime windows, recovery
+    times and the collateral latency/error impact on endpoints each attack didn't target.
+    """
+
+    def __init__(self, base_url, interval=INTERVAL, bystanders=BYSTANDERS):
+        self.interval = interval
+        self.endpoints = [HEALTH] + [e for e in bystanders if e != HEALTH]
+        # Enough connections for every probe that can overlap while the victim hangs
+        overlap = math.ceil(PROBE_TIMEOUT / interval) + 1
+        self.engine = LoadEngine(base_url, pool_size=len(self.endpoints) * overlap, timeout=PROBE_TIMEOUT)
+        self.probes = deque(maxlen=MAX_PROBES)  # (t, endpoint, ok, latency_s, label)
+        self.label = BASELINE
+        self.active = []  # attacks currently running, in start order
+        self.targets = {}  # attack label -> endpoint it targeted
+        self.started = None
+        self.task = None
+
+    async def start(self):
+        await self.engine.__aenter__()
+        self.started = time.time()
+        self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.engine.session:
+            await self.engine.__aexit__(None, None, None)
+
+    def begin(self, name, endpoint):
+        self.targets[name] = endpoint
+        self.active.append(name)
+        self.label = OVERLAP.join(self.active)
+
+    def end(self, name):
+        self.active.remove(name)
+        self.label = OVERLAP.join(self.active) or "idle"
+
+    async def _probe(self, endpoint, label):
+        sent = time.time()
+        res = await self.engine.request("GET", endpoint, timeout=PROBE_TIMEOUT)
+        ok = res.ok and res.status < 500 and (endpoint != HEALTH or res.status == 200)
+        self.probes.append((sent, endpoint, ok, res.latency, label))
+
+    async def _loop(self):
+        # Probes are fired without waiting for the previous round, so a hung victim
+        # (every probe running into its timeout) doesn't stretch the sampling cadence.
+        in_flight = set()
+        try:
+            while True:
+                tick = time.monotonic()
+                for endpoint in self.endpoints:
+                    task = asyncio.create_task(self._probe(endpoint, self.label))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - tick)))
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    def downtime(self):
+        """Contiguous health-check failure windows, with time-to-recover for the closed ones."""
+        windows, current = [], None
+        for t, endpoint, ok, _, label in sorted(self.probes):
+            if endpoint != HEALTH:
+                continue
+            if not ok and current is None:
+                current = {"start": round(t - self.started, 2), "attack": label}
+            elif ok and current is not None:
+                current["end"] = round(t - self.started, 2)
+                current["time_to_recover_s"] = round(current["end"] - current["start"], 2)
+                windows.append(current)
+                current = None
+        if current is not None:
+            current["end"] = None  # still down when monitoring stopped
+            windows.append(current)
+        return windows
+
+    def _summarize(self, probes):
+        h = LatencyHistogram()
+        failures = 0
+        for _, _, ok, latency, _ in probes:
+            if ok:
+                h.record(latency)
+            else:
+                failures += 1
+
+        def ms(pct):
+            value = h.percentile(pct)
+            return None if value is None else round(value / 1000, 2)
+
+        return {"probes": len(probes), "availability": round(1 - failures / len(probes), 4) if probes else None,
+                "p50_ms": ms(50), "p99_ms": ms(99)}
+
+    def report(self):
+        probes = sorted(self.probes)
+        health = [p for p in probes if p[1] == HEALTH]
+        by_key = {}
+        for p in probes:
+            # A probe taken while attacks overlapped counts towards each of them, except
+            # where it hit an endpoint one of the other overlapping attacks was aiming at
+            labels = p[4].split(OVERLAP)
+            for label in labels:
+                if any(self.targets.get(other) == p[1] for other in labels if other != label):
+                    continue
+                by_key.setdefault((label, p[1]), []).append(p)
+
+        baseline = {e: self._summarize(by_key.get((BASELINE, e), [])) for e in self.endpoints}
+        collateral = {}
+        for name, target in self.targets.items():
+            impact = {}
+            for endpoint in self.endpoints:
+                if endpoint == target:
+                    continue
+                during = self._summarize(by_key.get((name, endpoint), []))
+                base = baseline[endpoint]
+                if during["p50_ms"] is not None and base["p50_ms"]:
+                    during["p50_slowdown"] = round(during["p50_ms"] / base["p50_ms"], 2)
+                impact[endpoint] = during
+            collateral[name] = impact
+
+        windows = self.downtime()
+        return {
+            "interval_s": self.interval,
+            "duration_s": round(time.time() - self.started, 2) if self.started else 0,
+            "availability": self._summarize(health)["availability"],
+            "downtime_s": round(sum((w["end"] or (time.time() - self.started)) - w["start"] for w in windows), 2),
+            "downtime_windows": windows,
+            "baseline": baseline,
+            "collateral": collateral,
+            # Compact health timeline: [seconds since start, up?, latency ms]
+            "timeline": [[round(t - self.started, 2), ok, round(lat * 1000, 1)] for t, _, ok, lat, _ in health],
+        }
+
+    def summary(self):
+        r = self.report()
+        lines = [f"Monitor: availability {r['availability']}, downtime {r['downtime_s']}s "
+                 f"in {len(r['downtime_windows'])} window(s)"]
+        for w in r["downtime_windows"]:
+            ttr = f"recovered after {w['time_to_recover_s']}s" if w["end"] is not None else "never recovered"
+            lines.append(f"      -> DOWN at +{w['start']}s during '{w['attack']}', {ttr}")
+        for name, impact in r["collateral"].items():
+            for endpoint, stats in impact.items():
+                degraded = (stats.get("p50_slowdown") or 1) >= 1.5
+                if degraded or (stats["availability"] is not None and stats["availability"] < 1):
+                    lines.append(f"      -> '{name}' hit {endpoint}: p50 x{stats.get('p50_slowdown')}, "
+                                 f"availability {stats['availability']}")
+        return "\n".join(lines)
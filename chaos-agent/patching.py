@@ -0,0 +1,206 @@
+"""
+Unified-diff patches for the healer: applying a model-written diff to a source file,
+and validating the result in a scratch copy of the project. validate() runs in worker
+processes, so this module stays free of heavy imports.
+"""
+import fcntl
+import hashlib
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+
+# CONFIGURATION
+# Build check run in a scratch copy of the project; "auto" picks Maven when there is a
+# pom.xml and mvn is installed, "" limits validation to the structural check
+VALIDATE_CMD = os.getenv("HEAL_VALIDATE_CMD", "auto")
+VALIDATE_TIMEOUT = float(os.getenv("HEAL_VALIDATE_TIMEOUT", "600"))
+# Local Maven repository: the m2-cache volume, shared by every validator in every slot
+MAVEN_REPO = os.getenv("HEAL_MAVEN_REPO", os.path.expanduser("~/.m2"))
+SCRATCH_IGNORE = shutil.ignore_patterns(".git", "target", "build", "node_modules")
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,\d+)? \+\d+(?:,\d+)? @@")
+
+
+class PatchError(ValueError):
+    """The diff is malformed or doesn't match the file it was written for."""
+
+
+def parse_hunks(diff):
+    """[(old_start, [(op, text), ...]), ...] from unified diff text. File headers are ignored."""
+    hunks = []
+    for line in diff.replace("\r\n", "\n").split("\n"):
+        header = HUNK_HEADER.match(line)
+        if header:
+            hunks.append((int(header.group(1)), []))
+        elif hunks and line[:1] in (" ", "-", "+"):
+            hunks[-1][1].append((line[0], line[1:]))
+        elif hunks and line == "":
+            hunks[-1][1].append((" ", ""))  # some models strip the space off blank context lines
+        elif hunks and not line.startswith(("\\", "---", "+++", "diff ", "index ", "```")):
+            raise PatchError(f"unexpected line in hunk: {line[:60]!r}")
+    if not hunks:
+        raise PatchError("no hunks in diff")
+    # Trailing blank "context" from the final newline isn't part of any hunk
+    for _, lines in hunks:
+        while lines and lines[-1] == (" ", ""):
+            lines.pop()
+    return hunks
+
+
+def _find(lines, old, hint, start):
+    """Index where `old` occurs in lines[start:], closest to `hint`; whitespace-tolerant."""
+    def norm(s):
+        return s.rstrip()
+
+    target = [norm(s) for s in old]
+    matches = [i for i in range(start, len(lines) - len(old) + 1)
+               if [norm(s) for s in lines[i:i + len(old)]] == target]
+    if not matches:
+        raise PatchError(f"hunk near line {hint + 1} doesn't match the file")
+    return min(matches, key=lambda i: abs(i - hint))
+
+
+def apply_diff(source, diff):
+    """
+    Returns `source` with `diff` applied. Hunks are located by their context rather than
+    trusting the line numbers, which models often get wrong.
+    """
+    lines = source.split("\n")
+    out, cursor = [], 0
+    for old_start, body in parse_hunks(diff):
+        old = [text for op, text in body if op != "+"]
+        new = [text for op, text in body if op != "-"]
+        # A hunk with no old lines inserts after line old_start
+        at = _find(lines, old, max(old_start - 1, cursor), cursor) if old else max(old_start, cursor)
+        out += lines[cursor:at] + new
+        cursor = at + len(old)
+    return "\n".join(out + lines[cursor:])
+
+
+def check_structure(code):
+    """Cheap guard against truncated output: brackets balance outside strings and comments."""
+    pairs = {")": "(", "]": "[", "}": "{"}
+    stack = []
+    i, n = 0, len(code)
+    while i < n:
+        ch = code[i]
+        if code.startswith("//", i):
+            i = code.find("\n", i)
+            i = n if i < 0 else i
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            if end < 0:
+                return "unterminated comment"
+            i = end + 1
+        elif ch in "\"'":
+            if code.startswith('"""', i):
+                end = code.find('"""', i + 3)
+                if end < 0:
+                    return "unterminated text block"
+                i = end + 2
+            else:
+                j = i + 1
+                while j < n and code[j] != ch and code[j] != "\n":
+                    j += 2 if code[j] == "\\" else 1
+                if j >= n or code[j] != ch:
+                    return f"unterminated literal at offset {i}"
+                i = j
+        elif ch in "([{":
+            stack.append(ch)
+        elif ch in pairs:
+            if not stack or stack.pop() != pairs[ch]:
+                return f"unbalanced '{ch}' at offset {i}"
+        i += 1
+    return f"unclosed '{stack[-1]}'" if stack else None
+
+
+def build_command(project_dir, command=VALIDATE_CMD):
+    if command != "auto":
+        return shlex.split(command) if command else None
+    if os.path.exists(os.path.join(project_dir, "pom.xml")) and shutil.which("mvn"):
+        return ["mvn", "-q", "-B", "compile"]
+    return None
+
+
+def run_build(cmd, root, timeout):
+    """
+    Runs the build check. Concurrent Maven builds resolving into the same local repository
+    can corrupt each other's downloads, so the first build of a pom runs alone under a
+    file lock and warms the repository; once one has passed, builds of that pom run
+    offline and in parallel.
+    """
+    pom = os.path.join(root, "pom.xml")
+    if cmd[0] != "mvn" or not os.path.exists(pom):
+        return subprocess.run(cmd, cwd=root, capture_output=True, text=True, timeout=timeout)
+    os.makedirs(MAVEN_REPO, exist_ok=True)
+    with open(pom, "rb") as f:
+        warm = os.path.join(MAVEN_REPO, f".entropy-warm-{hashlib.sha256(f.read()).hexdigest()[:16]}")
+    if not os.path.exists(warm):
+        with open(os.path.join(MAVEN_REPO, ".entropy-validate.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if not os.path.exists(warm):
+                result = subprocess.run(cmd, cwd=root, capture_output=True, text=True, timeout=timeout)
+                if result.returncode == 0:
+                    open(warm, "w").close()
+                return result
+    return subprocess.run(cmd + ["-o"], cwd=root, capture_output=True, text=True, timeout=timeout)
+
+
+def validate(project_dir, files, command=VALIDATE_CMD, timeout=VALIDATE_TIMEOUT):
+    """
+    Checks candidate contents for {relative path: code} against a scratch copy of the
+    project. Returns None when they pass, else a short reason. Runs in a worker process.
+    """
+    for path, code in files.items():
+        problem = check_structure(code)
+        if problem:
+            return f"{path}: {problem}"
+
+    cmd = build_command(project_dir, command)
+    if cmd is None:
+        return None
+    with tempfile.TemporaryDirectory(prefix="heal-") as scratch:
+        root = os.path.join(scratch, "project")
+        shutil.copytree(project_dir, root, ignore=SCRATCH_IGNORE)
+        for path, code in files.items():
+            with open(os.path.join(root, path), "w") as f:
+                f.write(code)
+        try:
+            result = run_build(cmd, root, timeout)
+        except subprocess.TimeoutExpired:
+            return f"'{' '.join(cmd)}' timed out after {timeout:g}s"
+        if result.returncode != 0:
+            output = (result.stdout + result.stderr).strip().splitlines()
+            errors = [line for line in output if "ERROR" in line] or output
+            return "\n".join(errors[:20]) or f"'{' '.join(cmd)}' exited with {result.returncode}"
+    return None
+
+
+def write_atomically(root, files):
+    """
+    Writes {relative path: code} all-or-nothing: every file is staged beside its target
+    first, then swapped in; if any swap fails the originals are put back.
+    """
+    staged, originals = [], {}
+    try:
+        for path, code in files.items():
+            target = os.path.join(root, path)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".heal-")
+            with os.fdopen(fd, "w") as f:
+                f.write(code)
+            shutil.copymode(target, tmp)
+            staged.append((tmp, target))
+        for tmp, target in staged:
+            with open(target) as f:
+                originals[target] = f.read()
+            os.replace(tmp, target)
+    except BaseException:
+        for target, code in originals.items():
+            with open(target, "w") as f:
+                f.write(code)
+        for tmp, _ in staged:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
@@ -0,0 +1,183 @@
+"""
+Incremental attack plans: the strategist appends each vulnerability card to
+attack_plan.jsonl the moment the model finishes writing it, and the attacker can follow
+that file instead of waiting for the final attack_plan.json.
+
+File layout: a {"run": <id>} header, one card per line, then a {"done": true} trailer.
+The run id keeps a follower from replaying a previous mission's stale stream.
+"""
+import asyncio
+import json
+import os
+import time
+
+# CONFIGURATION
+STREAM_FILE = os.getenv("PLAN_STREAM_FILE", "attack_plan.jsonl")
+FOLLOW_POLL = float(os.getenv("PLAN_FOLLOW_POLL", "0.2"))
+FOLLOW_IDLE_TIMEOUT = float(os.getenv("PLAN_FOLLOW_IDLE_TIMEOUT", "600"))  # give up if the stream stalls
+
+
+class CardParser:
+    """
+    Pulls complete objects out of a JSON array as text arrives. Anything before the array
+    (Markdown fences, prose) is skipped, and a bare top-level object is accepted too. An
+    element that fails to parse is counted in `malformed` and dropped; the elements
+    around it still come through.
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.depth = 0
+        self.element_depth = None  # depth at which cards live: 1 inside an array, 0 for bare objects
+        self.start = None
+        self.in_string = False
+        self.escape = False
+        self.malformed = 0
+
+    def feed(self, text):
+        """Consumes the next chunk and returns the cards it completed."""
+        self.buf += text
+        cards = []
+        while self.pos < len(self.buf):
+            ch = self.buf[self.pos]
+            if self.element_depth is None:
+                if ch == "[":
+                    self.element_depth, self.depth = 1, 1
+                elif ch == "{":
+                    self.element_depth, self.depth = 0, 0
+                    continue  # re-read the brace as the start of a card
+            elif self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if ch == "{" and self.depth == self.element_depth:
+                    self.start = self.pos
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if ch == "}" and self.depth == self.element_depth and self.start is not None:
+                    self._complete(self.buf[self.start:self.pos + 1], cards)
+                    self.start = None
+                if self.depth < self.element_depth or (self.element_depth == 0 and self.depth == 0):
+                    # Top-level value closed; a later array or object starts a new one
+                    self.element_depth, self.depth = None, 0
+            self.pos += 1
+
+        # Drop consumed text, keeping only a card that is still being written
+        keep = self.start if self.start is not None else self.pos
+        self.buf, self.pos = self.buf[keep:], self.pos - keep
+        if self.start is not None:
+            self.start = 0
+        return cards
+
+    def _complete(self, text, cards):
+        try:
+            card = json.loads(text)
+        except ValueError:
+            self.malformed += 1
+            return
+        if isinstance(card, dict):
+            cards.append(card)
+
+    def close(self):
+        """End of output: a card still open was cut off."""
+        if self.start is not None:
+            self.malformed += 1
+            self.start = None
+
+
+class PlanWriter:
+    """Appends cards to the stream file, flushed per line so followers see them immediately."""
+
+    def __init__(self, run_id, path=STREAM_FILE):
+        self.file = open(path, "w")
+        self._write({"run": run_id, "started": time.time()})
+
+    def _write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def add(self, card):
+        self._write(card)
+
+    def close(self, **summary):
+        if not self.file.closed:
+            self._write({"done": True, **summary})
+            self.file.close()
+
+
+def seal(run_id, path=STREAM_FILE):
+    """
+    Ends run `run_id`'s stream if its strategist didn't (it crashed, or never got as far
+    as opening it), so a follower stops instead of waiting out the idle timeout.
+    """
+    header, done, text = None, False, ""
+    try:
+        with open(path) as f:
+            text = f.read()
+    except FileNotFoundError:
+        pass
+    for line in text.splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if header is None:
+            header = record.get("run")
+        elif record.get("done"):
+            done = True
+    if header != run_id:
+        print(f"Plan stream of run {run_id} was never started. Writing an empty one.")
+        PlanWriter(run_id, path).close(cards=0)
+    elif not done:
+        print(f"Plan stream of run {run_id} was left open. Closing it.")
+        with open(path, "a") as f:
+            f.write(("" if text.endswith("\n") else "\n") + json.dumps({"done": True}) + "\n")
+
+
+async def follow(run_id, path=STREAM_FILE, poll=FOLLOW_POLL, idle_timeout=FOLLOW_IDLE_TIMEOUT):
+    """
+    Yields cards from the stream of run `run_id` as they are appended, until its trailer.
+    With run_id None, whatever stream is in the file is followed.
+    """
+    position, last_progress, header_seen = 0, time.monotonic(), False
+    pending = ""
+    while time.monotonic() - last_progress < idle_timeout:
+        try:
+            with open(path) as f:
+                if os.fstat(f.fileno()).st_size < position:
+                    position, pending, header_seen = 0, "", False  # rewritten by a new run
+                f.seek(position)
+                chunk = f.read()
+                position = f.tell()
+        except FileNotFoundError:
+            chunk = ""
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # cut off by a strategist that died mid-write
+            if not header_seen:
+                if run_id is not None and record.get("run") != run_id:
+                    # Previous mission's file: wait for the strategist to start over
+                    position, pending = 0, ""
+                    break
+                header_seen = True
+            elif record.get("done"):
+                return
+            else:
+                yield record
+            last_progress = time.monotonic()
+        await asyncio.sleep(poll)
+    print(f"Plan stream {path} stalled for {idle_timeout:g}s. Continuing with what arrived.")
@@ -0,0 +1,110 @@
+import asyncio
+import os
+
+from histogram import AttackStats
+
+# CONFIGURATION
+# A load level "passes" while p99 latency, error rate and the health check all stay within SLO.
+SLO_P99_MS = float(os.getenv("SLO_P99_MS", "1000"))
+SLO_ERROR_RATE = float(os.getenv("SLO_ERROR_RATE", "0.01"))
+START_CONCURRENCY = int(os.getenv("RAMP_START", "1"))
+MAX_CONCURRENCY = int(os.getenv("RAMP_MAX", "512"))
+GROWTH = float(os.getenv("RAMP_GROWTH", "2"))  # concurrency multiplier per step
+RATE_PER_SLOT = float(os.getenv("RAMP_RATE_PER_SLOT", "0"))  # req/s per unit of concurrency, 0 = closed loop
+REQUESTS_PER_SLOT = int(os.getenv("RAMP_REQUESTS_PER_SLOT", "10"))
+MIN_REQUESTS = int(os.getenv("RAMP_MIN_REQUESTS", "20"))
+COOLDOWN = float(os.getenv("RAMP_COOLDOWN", "2"))  # seconds between levels so queues drain
+SEARCH = os.getenv("RAMP_SEARCH", "binary")  # "binary" refines between last pass and first fail, "step" stops
+
+
+def slo_breach(report, healthy):
+    """Returns the first violated SLO as a short reason, or None when the level passes."""
+    if not healthy:
+        return "health check failed"
+    if report["error_rate"] > SLO_ERROR_RATE:
+        return f"error rate {report['error_rate']:.1%} > {SLO_ERROR_RATE:.1%}"
+    p99 = report["latency_ms"]["p99"]
+    if p99 is None or p99 > SLO_P99_MS:
+        return f"p99 {p99}ms > {SLO_P99_MS:g}ms"
+    return None
+
+
+async def probe(engine, name, method, path, concurrency, **kwargs):
+    """Runs one load level and returns (step report, breach reason)."""
+    rate = concurrency * RATE_PER_SLOT
+    stats = AttackStats(f"{name} @ {concurrency}", path)
+    total = max(MIN_REQUESTS, concurrency * REQUESTS_PER_SLOT)
+    await engine.run(method, path, total, concurrency=concurrency, rate=rate, stats=stats, **kwargs)
+    healthy = await engine.health()
+    report = stats.report()
+    reason = slo_breach(report, healthy)
+    step = {
+        "concurrency": concurrency,
+        "target_rps": rate or None,
+        "rps": report["rps"],
+        "p99_ms": report["latency_ms"]["p99"],
+        "error_rate": report["error_rate"],
+        "healthy": healthy,
+        "breach": reason,
+    }
+    verdict = f"BREACH ({reason})" if reason else "ok"
+    print(f"      -> c={concurrency:<5} {report['rps']} rps, p99={step['p99_ms']}ms, "
+          f"errors {report['error_rate']:.1%}: {verdict}")
+    return step, reason
+
+
+async def find_capacity(engine, name, method, path, **kwargs):
+    """
+    Raises concurrency geometrically until an SLO breaks, then (in binary mode) bisects
+    between the last passing and first failing level. Reports the highest level that held.
+    """
+    print(f"Ramping {method} {path} (SLO: p99 <= {SLO_P99_MS:g}ms, errors <= {SLO_ERROR_RATE:.1%})...")
+    steps = []
+    good, bad, crashed = None, None, False
+
+    async def attempt(concurrency):
+        nonlocal crashed
+        step, reason = await probe(engine, name, method, path, concurrency, **kwargs)
+        steps.append(step)
+        crashed = not step["healthy"]
+        await asyncio.sleep(COOLDOWN)
+        return step, reason
+
+    concurrency = START_CONCURRENCY
+    while concurrency <= MAX_CONCURRENCY:
+        step, reason = await attempt(concurrency)
+        if reason:
+            bad = step
+            break
+        good = step
+        concurrency = max(concurrency + 1, int(concurrency * GROWTH))
+
+    # A dead victim can't be probed further; otherwise narrow the gap
+    if SEARCH == "binary" and good and bad and not crashed:
+        lo, hi = good["concurrency"], bad["concurrency"]
+        while hi - lo > max(1, lo // 10):
+            step, reason = await attempt((lo + hi) // 2)
+            if crashed:
+                bad = step
+                break
+            if reason:
+                bad, hi = step, step["concurrency"]
+            else:
+                good, lo = step, step["concurrency"]
+
+    result = {
+        "name": name,
+        "endpoint": path,
+        "max_sustainable_concurrency": good["concurrency"] if good else 0,
+        "max_sustainable_rps": good["rps"] if good else 0,
+        "breaking_concurrency": bad["concurrency"] if bad else None,
+        "breach": bad["breach"] if bad else None,
+        "victim_crashed": crashed,
+        "steps": steps,
+    }
+    if bad:
+        print(f"      -> Capacity: {result['max_sustainable_rps']} rps at concurrency "
+              f"{result['max_sustainable_concurrency']} (breaks at {bad['concurrency']}: {bad['breach']})")
+    else:
+        print(f"      -> No SLO breach up to concurrency {MAX_CONCURRENCY}.")
+    return result
@@ -0,0 +1,83 @@
+import asyncio
+import os
+
+# CONFIGURATION
+# "parallel" overlaps isolated attacks, "serial" runs the plan one attack at a time
+SCHEDULE = os.getenv("ATTACK_SCHEDULE", "parallel")
+PARALLELISM = int(os.getenv("ATTACK_PARALLELISM", "4"))  # attacks in flight at once
+# Attack kinds and the victim resource they exhaust. Heap and CPU are process-wide, so
+# flooding them skews every other attack's results; endpoint state only affects itself.
+RESOURCES = {"memory": "heap", "cpu": "cpu", "race": "state"}
+SHARED_RESOURCES = {"heap", "cpu"}
+
+
+def tag(kind, endpoint):
+    """Classifies an attack as "isolated" (safe to overlap) or "interfering" (must run alone)."""
+    resource = RESOURCES.get(kind, "unknown")
+    scope = "interfering" if resource in SHARED_RESOURCES or resource == "unknown" else "isolated"
+    return {"resource": resource, "scope": scope, "endpoints": {endpoint}}
+
+
+async def run_schedule(jobs, run_one, is_alive, parallelism=PARALLELISM):
+    """
+    Runs jobs in plan order; `jobs` may be an async iterable that's still being produced
+    (a followed plan stream). Isolated jobs overlap (up to `parallelism`, never two on the
+    same endpoint); interfering jobs wait for the floor to clear and run alone. After each
+    job the victim is health-checked, and the first failure cancels everything still
+    running. Returns True if the victim crashed.
+    """
+    crashed = asyncio.Event()
+    crash_watch = asyncio.create_task(crashed.wait())
+    started = []
+    running = set()
+    busy = set()
+
+    async def launch(job):
+        try:
+            await run_one(job)
+        finally:
+            busy.difference_update(job["endpoints"])
+        if not await is_alive():
+            crashed.set()
+
+    async def wait_any():
+        nonlocal running
+        await asyncio.wait(running | {crash_watch}, return_when=asyncio.FIRST_COMPLETED)
+        running = {t for t in running if not t.done()}
+
+    async def source():
+        if hasattr(jobs, "__aiter__"):
+            async for job in jobs:
+                yield job
+        else:
+            for job in jobs:
+                yield job
+
+    launched = []
+    try:
+        async for job in source():
+            exclusive = job["scope"] == "interfering"
+            while running and not crashed.is_set() and (
+                    exclusive or len(running) >= parallelism or busy & job["endpoints"]):
+                await wait_any()
+            if crashed.is_set():
+                break
+            busy.update(job["endpoints"])
+            task = asyncio.create_task(launch(job))
+            launched.append(job)
+            started.append(task)
+            running.add(task)
+            while exclusive and task in running and not crashed.is_set():
+                await wait_any()
+        while running and not crashed.is_set():
+            await wait_any()
+    finally:
+        # Stop-everything policy: once the victim is down nothing else is worth measuring
+        for task in running:
+            task.cancel()
+        crash_watch.cancel()
+        results = await asyncio.gather(*started, return_exceptions=True)
+    for job, result in zip(launched, results):
+        if isinstance(result, Exception):
+            print(f"      -> Attack '{job['name']}' failed: {result!r}")
+    return crashed.is_set()
@@ -1,62 +1,40 @@
 import os
 import json
+import sys
 import glob
 import requests
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from google import genai
 from json import JSONDecodeError
+from llm_cache import LLMCache
+import agent_metrics
+import llm_client
+from plan_stream import CardParser, PlanWriter
 
 # 1. SETUP: Load Environment Variables
 load_dotenv()
 
-api_key = os.getenv("GEMINI_API_KEY")
 user_id = os.getenv("USER_ID") 
 dashboard_url = os.getenv("DASHBOARD_API_URL", "http://localhost:3000/api/upload")
 
-if not api_key:
-    print("[ERROR] GEMINI_API_KEY not found! Check your .env file or environment variables.")
-    exit(1)
-
-# Initialize Client
-client = genai.Client(api_key=api_key)
-
 # Configuration
-TARGET_DIR = "../victim-app" 
-
-def analyze_code():
-    print("[INFO] Executing Strategist: Scanning for vulnerabilities...")
+TARGET_DIR = os.getenv("TARGET_DIR", "../victim-app")
+MODEL = "gemini-3-flash-preview"
+BATCH_TOKEN_BUDGET = int(os.getenv("STRATEGIST_BATCH_TOKENS", "30000"))  # source tokens per prompt
+MAX_IN_FLIGHT = int(os.getenv("STRATEGIST_MAX_IN_FLIGHT", "4"))  # concurrent Gemini calls
+SKIP_DIRS = ("/target/", "/build/", "/src/test/", "/.git/")
+SEVERITY_RANK = {"Critical": 2, "High": 1}
+CACHE = LLMCache("strategist")
+# Stream model output and publish each card as soon as it parses (attack_plan.jsonl, log)
+STREAM = os.getenv("STRATEGIST_STREAM", "on") == "on"
+PLAN_RUN = os.getenv("PLAN_RUN")  # mission id stamped on the stream so followers skip stale files
+PLAN_FILE = "attack_plan.json"
+CARD_PREFIX = "[CARD] "
 
-    # 2. AUTO-DISCOVERY
-    # Priority: Find Controllers first (high value targets), then fallback to any Java file
-    search_pattern = f"{TARGET_DIR}/**/*Controller.java"
-    found_files = glob.glob(search_pattern, recursive=True)
-    
-    if not found_files:
-        found_files = glob.glob(f"{TARGET_DIR}/**/*.java", recursive=True)
-        
-    if not found_files:
-        print(f"[ERROR] No Java source files found in {TARGET_DIR}!")
-        return
-
-    target_file = found_files[0]
-    # Use the parent folder name as the project name (e.g., "Payment_Gateway" instead of "PaymentController.java")
-    project_name = os.path.basename(os.path.dirname(target_file))
-    print(f"[INFO] Target Acquired: {target_file}")
-    print(f"[INFO] Project Name Detected: {project_name}")
-
-    # 3. READ FILE
-    try:
-        with open(target_file, "r") as f:
-            code_content = f.read()
-        print(f"[INFO] Read {len(code_content)} bytes of code.")
-    except Exception as e:
-        print(f"[ERROR] Failed to read file: {e}")
-        return
-
-    print("[INFO] Sending code to Gemini for strategic analysis...")
-
-    # 4. THE PROMPT
-    prompt = f"""
+PROMPT_TEMPLATE = """
     You are a Senior Security Architect. Analyze this Java Spring Boot code.
     
     SOURCE CODE:
@@ -72,31 +50,217 @@ def analyze_code():
     5. "trigger_endpoint": Relative URL path.
     6. "diagram_code": Mermaid.js sequence diagram string.
     7. "fix_explanation": Single sentence fix.
+    8. "source_file": The FILE path (exactly as given above) containing the vulnerable code.
+    If there are no vulnerabilities, return [].
     """
 
-    try:
-        # 5. EXECUTE GEMINI
-        # Note: Using 'gemini-1.5-flash' as it is the current standard. 
-        # If you have access to 'gemini-3-flash-preview', you can change it back.
-        response = client.models.generate_content(
-            model='gemini-3-flash-preview', 
-            contents=prompt
-        )
-
-        # 6. CLEANUP & PARSE
-        clean_json = response.text.replace("```json", "").replace("```", "").strip()
-        
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting Java source
+    return len(text) // 4 + 1
+
+def discover_sources(target_dir):
+    """All Java sources in the tree, controllers first (highest-value targets)."""
+    found_files = glob.glob(f"{target_dir}/**/*.java", recursive=True)
+    found_files = [f for f in found_files if not any(d in f.replace(os.sep, "/") for d in SKIP_DIRS)]
+    return sorted(found_files, key=lambda f: (not f.endswith("Controller.java"), f))
+
+def pack_batches(sources, budget=BATCH_TOKEN_BUDGET):
+    """
+    Greedily packs (path, code) pairs into prompt-sized batches under the token budget.
+    A single file larger than the budget gets a batch of its own.
+    """
+    batches, current, used = [], [], 0
+    for path, code in sources:
+        cost = estimate_tokens(code)
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append((path, code))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def render_batch(batch):
+    return "\n".join(f"// FILE: {path}\n{code}" for path, code in batch)
+
+def parse_cards(text):
+    clean_json = text.replace("```json", "").replace("```", "").strip()
+    cards = json.loads(clean_json)
+    return cards if isinstance(cards, list) else [cards]
+
+def analyze_batch(index, batch, on_card=lambda card: None):
+    """
+    Sends one batch to Gemini, handing each card to `on_card` as soon as it's complete.
+    Returns (cards, raw_text_on_parse_failure); in streaming mode a malformed card only
+    costs that card, and the raw text is still returned for debugging.
+    """
+    code_content = render_batch(batch)
+    key = CACHE.key(PROMPT_TEMPLATE, MODEL, code_content)
+    cached = CACHE.get(key)
+    if cached is not None:
+        print(f"[INFO] Batch {index + 1}: cache hit, skipping model call")
+        agent_metrics.llm_call("strategist", MODEL, outcome="cached")
+        for card in cached:
+            on_card(card)
+        return cached, None
+
+    print(f"[INFO] Batch {index + 1}: {len(batch)} file(s), ~{estimate_tokens(code_content)} tokens")
+    prompt = PROMPT_TEMPLATE.format(code_content=code_content)
+    if not STREAM:
+        text = llm_client.generate("strategist", prompt, MODEL)
         try:
-            analysis_results = json.loads(clean_json)
+            cards = parse_cards(text)
         except JSONDecodeError:
-            print("[ERROR] Gemini returned invalid JSON. Saving raw response for debug.")
+            return [], text
+        for card in cards:
+            on_card(card)
+    else:
+        parser, chunks, cards = CardParser(), [], []
+        for chunk in llm_client.stream("strategist", prompt, MODEL):
+            chunks.append(chunk)
+            for card in parser.feed(chunk):
+                cards.append(card)
+                on_card(card)
+        parser.close()
+        if parser.malformed:
+            print(f"[WARN] Batch {index + 1}: dropped {parser.malformed} malformed card(s), kept {len(cards)}")
+            return cards, "".join(chunks)
+    CACHE.put(key, cards)
+    return cards, None
+
+def normalize_endpoint(endpoint):
+    endpoint = endpoint.strip()
+    for verb in ("GET ", "POST ", "PUT ", "DELETE ", "PATCH "):
+        if endpoint.upper().startswith(verb):
+            endpoint = endpoint[len(verb):]
+    return endpoint.split("?")[0].rstrip("/").lower()
+
+def card_key(card):
+    return normalize_endpoint(card["trigger_endpoint"]), card.get("type", "").strip().lower()
+
+def merge_cards(card_lists):
+    """Deduplicates findings across batches by (endpoint, type), keeping the most severe."""
+    merged = {}
+    for cards in card_lists:
+        for card in cards:
+            if not isinstance(card, dict) or "trigger_endpoint" not in card:
+                continue
+            key = card_key(card)
+            best = merged.get(key)
+            if best is None or SEVERITY_RANK.get(card.get("severity"), 0) > SEVERITY_RANK.get(best.get("severity"), 0):
+                merged[key] = card
+    return list(merged.values())
+
+def save_plan(cards):
+    # Atomic, so a reader never sees a half-written plan
+    with open(PLAN_FILE + ".tmp", "w") as f:
+        json.dump(cards, f, indent=2)
+    os.replace(PLAN_FILE + ".tmp", PLAN_FILE)
+
+class CardEmitter:
+    """
+    Publishes each new (endpoint, type) finding the moment it's parsed: appended to the
+    plan stream, written into the partial attack_plan.json and printed for the orchestrator.
+    Called from the batch worker threads.
+    """
+
+    def __init__(self, run_id):
+        self.writer = PlanWriter(run_id)
+        self.cards = []
+        self.seen = set()
+        self.lock = threading.Lock()
+
+    def __call__(self, card):
+        if not isinstance(card, dict) or "trigger_endpoint" not in card:
+            return
+        with self.lock:
+            if card_key(card) in self.seen:
+                return
+            self.seen.add(card_key(card))
+            self.cards.append(card)
+            self.writer.add(card)
+            save_plan(self.cards)
+            # One write, in discovery order: print() would send the newline separately
+            sys.stdout.write(CARD_PREFIX + json.dumps(card) + "\n")
+
+    def close(self):
+        self.writer.close(cards=len(self.cards))
+
+def analyze_code():
+    print("[INFO] Executing Strategist: Scanning for vulnerabilities...")
+    # Opened first so an attacker following the stream hears about every way this ends
+    emit = CardEmitter(PLAN_RUN or f"local-{time.time():.0f}")
+    if not llm_client.configured():
+        # Like the healer: cached batches still work, only a cache miss needs the key
+        print("[WARN] GEMINI_API_KEY not found! Only batches already in the cache can be analyzed.")
+
+    # 2. AUTO-DISCOVERY
+    # Whole tree, controllers first (high value targets), then every other Java file
+    found_files = discover_sources(TARGET_DIR)
+        
+    if not found_files:
+        print(f"[ERROR] No Java source files found in {TARGET_DIR}!")
+        emit.close()
+        return
+
+    # Use the parent folder name as the project name (e.g., "Payment_Gateway" instead of "PaymentController.java")
+    project_name = os.path.basename(os.path.dirname(found_files[0]))
+    print(f"[INFO] Targets Acquired: {len(found_files)} source file(s)")
+    print(f"[INFO] Project Name Detected: {project_name}")
+
+    # 3. READ FILES
+    sources = []
+    for path in found_files:
+        try:
+            with open(path, "r") as f:
+                sources.append((os.path.relpath(path, TARGET_DIR), f.read()))
+        except Exception as e:
+            print(f"[WARN] Failed to read {path}: {e}")
+    if not sources:
+        print("[ERROR] Failed to read any source file.")
+        emit.close()
+        return
+    print(f"[INFO] Read {sum(len(c) for _, c in sources)} bytes of code.")
+
+    # 4. PACK INTO TOKEN-BUDGETED BATCHES
+    batches = pack_batches(sources)
+    print(f"[INFO] Sending {len(batches)} batch(es) to Gemini for strategic analysis "
+          f"(max {MAX_IN_FLIGHT} in flight)...")
+
+    try:
+        # 5. EXECUTE GEMINI (bounded fan-out)
+        with ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT) as pool:
+            # Each worker runs in a copy of our context so output capture follows it
+            futures = [pool.submit(contextvars.copy_context().run, analyze_batch, i, batch, emit)
+                       for i, batch in enumerate(batches)]
+            outcomes = []
+            for i, future in enumerate(futures):
+                try:
+                    outcomes.append(future.result())
+                except Exception as e:
+                    print(f"[ERROR] Batch {i + 1} failed: {e}")
+
+        print(CACHE.stats())
+
+        # 6. MERGE & DEDUPLICATE
+        failed_raw = [raw for _, raw in outcomes if raw is not None]
+        if failed_raw:
+            print(f"[ERROR] {len(failed_raw)} batch(es) returned invalid JSON. Saving raw responses for debug.")
             with open("debug_response.txt", "w") as f:
-                f.write(clean_json)
+                f.write("\n\n----- BATCH -----\n\n".join(failed_raw))
+
+        # Every card already published, including those of a batch whose stream broke off later
+        if not emit.cards and (not outcomes or failed_raw):
+            print("[ERROR] No batch produced a usable analysis.")
             return None
 
+        analysis_results = merge_cards([*(cards for cards, _ in outcomes), emit.cards])
+        print(f"[INFO] Merged findings of {len(outcomes)}/{len(batches)} complete batch(es) and every published card "
+              f"into {len(analysis_results)} unique issue(s).")
+
         # Always save locally (Lightning Mode / Backup)
-        with open("attack_plan.json", "w") as f:
-            json.dump(analysis_results, f, indent=2)
+        save_plan(analysis_results)
         print("[SUCCESS] Local backup 'attack_plan.json' saved.")
 
         # 7. DUAL-TRACK STORAGE LOGIC
@@ -127,6 +291,10 @@ def analyze_code():
     except Exception as e:
         print(f"[ERROR] Analysis pipeline failed: {e}")
         return None
+    finally:
+        # Followers stop at the trailer whether or not the analysis succeeded
+        emit.close()
 
 if __name__ == "__main__":
+    sys.stdout = agent_metrics.LineWriter(sys.stdout)  # batches print from worker threads
     analyze_code()
\ No newline at end of file
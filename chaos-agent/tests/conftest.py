@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agent modules are flat scripts run from chaos-agent/, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
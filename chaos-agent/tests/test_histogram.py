@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+from histogram import HALF, AttackStats, LatencyHistogram, bucket_index, bucket_value
+
+
+def test_small_values_get_exact_buckets():
+    for value in range(2 * HALF):
+        assert bucket_index(value) == value
+        assert bucket_value(value) == value
+
+
+@pytest.mark.parametrize("value", [128, 129, 255, 256, 1000, 12_345, 999_999, 2_000_000_000])
+def test_bucket_midpoint_is_within_resolution(value):
+    assert abs(bucket_value(bucket_index(value)) - value) <= value / HALF
+
+
+def test_bucket_index_is_monotonic():
+    indexes = [bucket_index(v) for v in range(1, 100_000, 37)]
+    assert indexes == sorted(indexes)
+
+
+def test_percentiles_of_uniform_latencies():
+    h = LatencyHistogram()
+    for ms in range(1, 1001):
+        h.record(ms / 1000)
+    assert h.total == 1000
+    assert h.min == 1000 and h.max == 1_000_000
+    assert h.percentile(50) == pytest.approx(500_000, rel=0.02)
+    assert h.percentile(99) == pytest.approx(990_000, rel=0.02)
+    assert h.percentile(100) <= h.max
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_merge_equals_recording_everything_in_one():
+    a, b, both = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i, seconds in enumerate([0.001, 0.02, 0.3, 0.004, 1.5, 0.07]):
+        (a if i % 2 else b).record(seconds)
+        both.record(seconds)
+    merged = a.merge(b)
+    assert merged.to_dict() == both.to_dict()
+
+
+def test_round_trips_through_dict():
+    h = LatencyHistogram()
+    for seconds in (0.01, 0.2, 3.0):
+        h.record(seconds)
+    assert LatencyHistogram.from_dict(h.to_dict()).to_dict() == h.to_dict()
+
+
+def test_attack_stats_split_outcomes():
+    stats = AttackStats("race", "/api/buy")
+    for status, error in [(200, None), (200, None), (500, None), (None, "timeout"), (None, "refused")]:
+        stats.record(SimpleNamespace(status=status, error=error, latency=0.01))
+    assert stats.requests == 5
+    assert stats.ok == 2
+    assert stats.http_errors == {500: 1}
+    assert stats.timeouts == 1 and stats.connection_errors == 1
+    assert stats.latency.total == 3  # only completed responses have a latency
+    assert stats.error_rate == pytest.approx(0.6)
+    assert AttackStats.from_dict(stats.to_dict()).report() == stats.report()
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+
+import patching
+from patching import PatchError, apply_diff, check_structure, parse_hunks, write_atomically
+
+SOURCE = "\n".join([
+    "class A {",
+    "    int a() {",
+    "        return 1;",
+    "    }",
+    "",
+    "    int b() {",
+    "        return 1;",
+    "    }",
+    "}",
+    "",
+])
+
+
+def test_hunk_located_by_context_despite_wrong_line_numbers():
+    diff = "\n".join([
+        "--- a/A.java",
+        "+++ b/A.java",
+        "@@ -40,3 +40,3 @@",
+        "     int b() {",
+        "-        return 1;",
+        "+        return 2;",
+        "     }",
+    ])
+    assert apply_diff(SOURCE, diff) == SOURCE.replace("int b() {\n        return 1;", "int b() {\n        return 2;")
+
+
+def test_repeated_context_picks_match_closest_to_header():
+    diff = "\n".join([
+        "@@ -7,1 +7,1 @@",
+        "-        return 1;",
+        "+        return 3;",
+    ])
+    patched = apply_diff(SOURCE, diff).split("\n")
+    assert patched[2] == "        return 1;"
+    assert patched[6] == "        return 3;"
+
+
+def test_context_matches_despite_trailing_whitespace():
+    diff = "\n".join([
+        "@@ -1,2 +1,2 @@",
+        " class A {   ",
+        "-    int a() {",
+        "+    long a() {",
+    ])
+    assert apply_diff(SOURCE, diff).split("\n")[1] == "    long a() {"
+
+
+def test_mismatched_context_is_rejected():
+    with pytest.raises(PatchError):
+        apply_diff(SOURCE, "@@ -1,1 +1,1 @@\n-class B {\n+class C {")
+
+
+def test_blank_context_without_leading_space_is_kept_inside_hunk():
+    diff = "@@ -4,3 +4,3 @@\n     }\n\n-    int b() {\n+    int c() {\n"
+    (start, body), = parse_hunks(diff)
+    assert start == 4
+    assert body == [(" ", "    }"), (" ", ""), ("-", "    int b() {"), ("+", "    int c() {")]
+    assert "int c()" in apply_diff(SOURCE, diff)
+
+
+def test_trailing_blank_context_is_stripped():
+    (_, body), = parse_hunks("@@ -1,1 +1,1 @@\n-class A {\n+class B {\n\n\n")
+    assert body == [("-", "class A {"), ("+", "class B {")]
+
+
+def test_unexpected_line_in_hunk_is_rejected():
+    with pytest.raises(PatchError):
+        parse_hunks("@@ -1,1 +1,1 @@\n-class A {\nSure! Here is the fix:")
+
+
+@pytest.mark.parametrize("code", [
+    'String s = "(}[";',
+    "char c = '{';",
+    'String s = "a \\" ) b";',
+    "// unbalanced ) in a comment\nint x = 1;",
+    "/* { [ ( */ int y = (1);",
+    'String t = """\n  }}} ((( \n""";',
+])
+def test_brackets_in_strings_and_comments_are_ignored(code):
+    assert check_structure("class A { " + code + "\n}") is None
+
+
+@pytest.mark.parametrize("code, problem", [
+    ("class A { void f() { }", "unclosed '{'"),
+    ("class A { ) }", "unbalanced ')'"),
+    ('class A { String s = "open; }', "unterminated literal"),
+    ("class A { /* never closed }", "unterminated comment"),
+])
+def test_truncated_code_is_reported(code, problem):
+    assert problem in check_structure(code)
+
+
+def test_write_atomically_replaces_every_file(tmp_path):
+    (tmp_path / "a.java").write_text("old a")
+    (tmp_path / "b.java").write_text("old b")
+    write_atomically(str(tmp_path), {"a.java": "new a", "b.java": "new b"})
+    assert (tmp_path / "a.java").read_text() == "new a"
+    assert (tmp_path / "b.java").read_text() == "new b"
+    assert sorted(os.listdir(tmp_path)) == ["a.java", "b.java"]
+
+
+def test_write_atomically_restores_originals_when_a_swap_fails(tmp_path, monkeypatch):
+    (tmp_path / "a.java").write_text("old a")
+    (tmp_path / "b.java").write_text("old b")
+    real_replace = os.replace
+
+    def failing_replace(src, dst):
+        if dst.endswith("b.java"):
+            raise OSError("disk full")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(patching.os, "replace", failing_replace)
+    with pytest.raises(OSError):
+        write_atomically(str(tmp_path), {"a.java": "new a", "b.java": "new b"})
+    assert (tmp_path / "a.java").read_text() == "old a"
+    assert (tmp_path / "b.java").read_text() == "old b"
+    assert sorted(os.listdir(tmp_path)) == ["a.java", "b.java"]  # no staged files left behind
@@ -0,0 +1,44 @@
+from plan_stream import CardParser
+
+
+def feed_all(parser, text, size=7):
+    """Feeds `text` in small chunks, as a streamed model response arrives."""
+    cards = []
+    for i in range(0, len(text), size):
+        cards += parser.feed(text[i:i + size])
+    parser.close()
+    return cards
+
+
+def test_cards_come_out_of_a_fenced_array():
+    text = 'Here you go:\n```json\n[{"name": "a", "nested": {"x": [1, 2]}}, {"name": "b"}]\n```'
+    assert feed_all(CardParser(), text) == [{"name": "a", "nested": {"x": [1, 2]}}, {"name": "b"}]
+
+
+def test_braces_inside_strings_do_not_split_cards():
+    text = '[{"name": "a", "payload": "}{\\"]["}, {"name": "b"}]'
+    assert [c["name"] for c in feed_all(CardParser(), text)] == ["a", "b"]
+
+
+def test_bare_object_is_accepted():
+    assert feed_all(CardParser(), '{"name": "only"}') == [{"name": "only"}]
+
+
+def test_malformed_card_is_dropped_and_its_neighbours_kept():
+    parser = CardParser()
+    text = '[{"name": "a"}, {"name": "b", oops}, {"name": "c"}]'
+    assert [c["name"] for c in feed_all(parser, text)] == ["a", "c"]
+    assert parser.malformed == 1
+
+
+def test_card_cut_off_at_end_of_output_counts_as_malformed():
+    parser = CardParser()
+    assert [c["name"] for c in feed_all(parser, '[{"name": "a"}, {"name": "b", "sev')] == ["a"]
+    assert parser.malformed == 1
+
+
+def test_cards_are_released_as_soon_as_they_close():
+    parser = CardParser()
+    assert parser.feed('[{"name": "a"}, {"name"') == [{"name": "a"}]
+    assert parser.feed(': "b"}') == [{"name": "b"}]
+    assert parser.feed("]") == []
@@ -0,0 +1,81 @@
+import asyncio
+
+from schedule import run_schedule, tag
+
+
+def job(name, kind, endpoint):
+    return {"name": name, **tag(kind, endpoint)}
+
+
+def test_tagging():
+    assert tag("race", "/api/buy") == {"resource": "state", "scope": "isolated", "endpoints": {"/api/buy"}}
+    assert tag("memory", "/a")["scope"] == "interfering"
+    assert tag("cpu", "/a")["scope"] == "interfering"
+    assert tag("sql-injection", "/a") == {"resource": "unknown", "scope": "interfering", "endpoints": {"/a"}}
+
+
+class Recorder:
+    """Records which jobs were in flight together."""
+
+    def __init__(self, crash_after=None):
+        self.active = set()
+        self.overlaps = set()
+        self.peak = 0
+        self.finished = []
+        self.crash_after = crash_after
+
+    async def run_one(self, job):
+        self.active.add(job["name"])
+        self.peak = max(self.peak, len(self.active))
+        self.overlaps.update(frozenset((job["name"], other)) for other in self.active if other != job["name"])
+        await asyncio.sleep(0.01)
+        self.active.discard(job["name"])
+        self.finished.append(job["name"])
+
+    async def is_alive(self):
+        return self.crash_after not in self.finished
+
+
+def run(jobs, recorder, parallelism=4):
+    return asyncio.run(run_schedule(jobs, recorder.run_one, recorder.is_alive, parallelism))
+
+
+def test_isolated_jobs_overlap_up_to_parallelism():
+    recorder = Recorder()
+    jobs = [job(f"race{n}", "race", f"/e{n}") for n in range(3)]
+    assert run(jobs, recorder, parallelism=2) is False
+    assert frozenset(("race0", "race1")) in recorder.overlaps
+    assert recorder.peak == 2
+    assert sorted(recorder.finished) == ["race0", "race1", "race2"]
+
+
+def test_interfering_jobs_run_alone():
+    recorder = Recorder()
+    jobs = [job("race0", "race", "/a"), job("flood", "memory", "/b"), job("race1", "race", "/c")]
+    run(jobs, recorder)
+    assert not any("flood" in pair for pair in recorder.overlaps)
+    assert recorder.finished == ["race0", "flood", "race1"]
+
+
+def test_same_endpoint_never_overlaps():
+    recorder = Recorder()
+    run([job("first", "race", "/a"), job("second", "race", "/a")], recorder)
+    assert recorder.overlaps == set()
+
+
+def test_crash_stops_the_rest():
+    recorder = Recorder(crash_after="flood")
+    jobs = [job("flood", "memory", "/a"), job("race", "race", "/b")]
+    assert run(jobs, recorder) is True
+    assert recorder.finished == ["flood"]
+
+
+def test_jobs_may_arrive_as_a_stream():
+    async def stream():
+        for n in range(2):
+            await asyncio.sleep(0)
+            yield job(f"race{n}", "race", f"/e{n}")
+
+    recorder = Recorder()
+    assert run(stream(), recorder) is False
+    assert sorted(recorder.finished) == ["race0", "race1"]
@@ -1,7 +1,9 @@
 "use client";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import EntropyLayout, { SystemData } from "@/components/entropy/EntropyLayout";
 
+const MAX_LOG_LINES = 2000;
+
 export default function DashboardDeployPage() {
   // 1. Setup State (Logic Only)
   const [data, setData] = useState<SystemData>({
@@ -12,15 +14,27 @@ export default function DashboardDeployPage() {
     telemetry: { cpu: 10, memory: 20 }
   });
   const [isStarting, setIsStarting] = useState(false);
+  const cursor = useRef<{ id: string | null; seq: number }>({ id: null, seq: -1 });
 
   // 2. Poll Backend for Status updates
   useEffect(() => {
     const interval = setInterval(async () => {
       try {
-        const res = await fetch("http://127.0.0.1:8000/status");
+        // Incremental poll: only log lines after our cursor come back
+        const res = await fetch(`http://127.0.0.1:8000/status?since=${cursor.current.seq}`);
         if (!res.ok) return;
         const json = await res.json();
-        setData(json);
+        if ((json.id ?? null) !== cursor.current.id) {
+          // New mission: restart from the beginning of its log on the next poll
+          cursor.current = { id: json.id ?? null, seq: -1 };
+          setData({ ...json, logs: [] });
+          return;
+        }
+        cursor.current.seq = json.cursor ?? -1;
+        setData(prev => ({
+          ...json,
+          logs: json.logs_truncated ? json.logs : [...prev.logs, ...json.logs].slice(-MAX_LOG_LINES),
+        }));
         
         // Stop local loading spinner once backend confirms it's running
         if (json.status === "RUNNING") setIsStarting(false);
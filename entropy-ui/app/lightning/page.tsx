@@ -1,21 +1,35 @@
 "use client";
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import EntropyLayout, { SystemData } from "@/components/entropy/EntropyLayout";
 
+const MAX_LOG_LINES = 2000;
+
 export default function LightningPage() {
   const [data, setData] = useState<SystemData>({
     status: "IDLE", phase: "READY", logs: [], vulnerabilities: [], telemetry: { cpu: 10, memory: 20 }
   });
   const [isStarting, setIsStarting] = useState(false);
+  const cursor = useRef<{ id: string | null; seq: number }>({ id: null, seq: -1 });
 
   // Poll for status (shared logic)
   useEffect(() => {
     const interval = setInterval(async () => {
       try {
-        const res = await fetch("http://127.0.0.1:8000/status");
+        // Incremental poll: only log lines after our cursor come back
+        const res = await fetch(`http://127.0.0.1:8000/status?since=${cursor.current.seq}`);
         if (!res.ok) return;
         const json = await res.json();
-        setData(json);
+        if ((json.id ?? null) !== cursor.current.id) {
+          // New mission: restart from the beginning of its log on the next poll
+          cursor.current = { id: json.id ?? null, seq: -1 };
+          setData({ ...json, logs: [] });
+          return;
+        }
+        cursor.current.seq = json.cursor ?? -1;
+        setData(prev => ({
+          ...json,
+          logs: json.logs_truncated ? json.logs : [...prev.logs, ...json.logs].slice(-MAX_LOG_LINES),
+        }));
         if (json.status === "RUNNING") setIsStarting(false);
       } catch (e) {}
     }, 800);
@@ -1,10 +1,66 @@
+import asyncio
+import json
+import os
 import subprocess
 import time
 import sys
+from contextlib import contextmanager
+
+from agent_client import call_agent_sync, AgentUnavailable, SCRIPTS
+from readiness import wait_for_victim_sync
+import rollout
+from snapshots import SnapshotStore
 
 # CONFIGURATION
 AGENT_CONTAINER = "agent_container"
 VICTIM_CONTAINER = "victim_container"
+VICTIM_DIR = "victim-app"
+METRIC_PREFIX = "[METRIC] "  # structured lines from chaos-agent/agent_metrics.py
+CARD_PREFIX = "[CARD] "  # findings the strategist publishes while it's still running
+# The victim Dockerfile uses RUN --mount and COPY --chmod, which legacy docker-compose only builds with BuildKit
+BUILD_ENV = {**os.environ, "DOCKER_BUILDKIT": "1", "COMPOSE_DOCKER_CLI_BUILD": "1"}
+TIMINGS = []  # (phase, seconds) in run order
+LLM_TOTALS = {}  # component -> {"calls", "seconds", "tokens"}
+
+@contextmanager
+def timed(phase):
+    started = time.time()
+    try:
+        yield
+    finally:
+        TIMINGS.append((phase, time.time() - started))
+
+def relay(line):
+    """Prints agent output, folding "[METRIC]" lines into LLM_TOTALS instead."""
+    if line.startswith(CARD_PREFIX):
+        try:
+            card = json.loads(line[len(CARD_PREFIX):])
+            print(f"   Found: {card.get('name')} ({card.get('severity')}) at {card.get('trigger_endpoint')}")
+        except ValueError:
+            print(line)
+        return
+    if not line.startswith(METRIC_PREFIX):
+        print(line)
+        return
+    try:
+        data = json.loads(line[len(METRIC_PREFIX):])
+    except ValueError:
+        return
+    if data.get("kind") == "llm":
+        totals = LLM_TOTALS.setdefault(data.get("component", "unknown"), {"calls": 0, "seconds": 0.0, "tokens": 0})
+        totals["calls"] += 1
+        totals["seconds"] += data.get("seconds") or 0
+        totals["tokens"] += sum(data.get(f"{k}_tokens") or 0 for k in ("prompt", "output", "thinking"))
+
+def print_timings():
+    if not TIMINGS:
+        return
+    total = sum(seconds for _, seconds in TIMINGS)
+    print("\n--- PHASE TIMINGS ---")
+    for phase, seconds in TIMINGS:
+        print(f"   {phase:<10} {seconds:8.1f}s  {seconds / total:6.1%}")
+    for component, totals in LLM_TOTALS.items():
+        print(f"   LLM {component}: {totals['calls']} call(s), {totals['seconds']:.1f}s, {totals['tokens']} tokens")
 
 def run_docker_command(container, script_name):
     """Runs a Python script inside the agent container."""
@@ -14,7 +70,8 @@ def run_docker_command(container, script_name):
     result = subprocess.run(cmd, capture_output=True, text=True)
     
     # Print output in real-time-ish
-    print(result.stdout)
+    for line in result.stdout.splitlines():
+        relay(line)
     
     if result.returncode != 0:
         print(f"Error running {script_name}:")
@@ -22,14 +79,31 @@ def run_docker_command(container, script_name):
         return False
     return True
 
-def restart_victim():
-    """Restarts the Victim App to apply patches."""
-    print(f"\nRestarting {VICTIM_CONTAINER} to apply patches...")
-    subprocess.run(["docker", "restart", VICTIM_CONTAINER], check=True)
+def run_agent_phase(phase):
+    """Runs a phase on the warm agent daemon, falling back to a cold docker exec."""
+    print(f"\nRunning {phase} on the agent daemon...")
+    try:
+        return call_agent_sync(phase, on_line=relay) == 0
+    except AgentUnavailable:
+        return run_docker_command(AGENT_CONTAINER, SCRIPTS[phase])
+
+def restart_victim(files=None):
+    """Puts the patches live: hot redeploy inside the container, or a full rebuild."""
+    print(f"\nDeploying patches to {VICTIM_CONTAINER}...")
+    restart_started = asyncio.run(rollout.redeploy(VICTIM_CONTAINER, VICTIM_DIR, files=files))
+    if restart_started is None:
+        restart_started = time.time()
+        if subprocess.run(["docker-compose", "up", "-d", "--build", "--force-recreate", "victim-app"],
+                          env=BUILD_ENV).returncode != 0:
+            print("Victim build failed.")
+            return False
     
-    print("Waiting for Spring Boot to initialize (15s)...")
-    time.sleep(15) # Give Java time to boot
+    print("Waiting for Spring Boot to initialize...")
+    if not wait_for_victim_sync(VICTIM_CONTAINER, since=restart_started):
+        print("Victim failed to come back online.")
+        return False
     print("Victim is back online.")
+    return True
 
 def main_loop():
     print("==================================================")
@@ -38,32 +112,51 @@ def main_loop():
 
     # STEP 1: STRATEGY
     print("\n--- PHASE 1: STRATEGIC ANALYSIS ---")
-    if not run_docker_command(AGENT_CONTAINER, "strategist.py"):
+    with timed("strategy"):
+        ok = run_agent_phase("strategize")
+    if not ok:
         print("Strategy failed. Aborting.")
         sys.exit(1)
 
     # STEP 2: ATTACK (The Initial Break)
     print("\n--- PHASE 2: ACTIVE ATTACK (BASELINE) ---")
-    run_docker_command(AGENT_CONTAINER, "attacker.py")
+    with timed("attack"):
+        run_agent_phase("attack")
     # We expect this to SUCCEED in crashing/exploiting the app
 
     # STEP 3: HEALING
     print("\n--- PHASE 3: AUTONOMOUS HEALING ---")
-    if not run_docker_command(AGENT_CONTAINER, "healer.py"):
+    snapshots = SnapshotStore()
+    snapshot = snapshots.take(VICTIM_DIR)
+    print(f"Snapshot {snapshot[:12]} of {VICTIM_DIR} taken before patching.")
+    with timed("heal"):
+        ok = run_agent_phase("heal")
+    if not ok:
         print("Healing failed. Aborting.")
         sys.exit(1)
 
     # STEP 4: RESTART
-    restart_victim()
+    with timed("restart"):
+        ok = restart_victim()
+    if not ok:
+        print("Patched victim failed to come up. Rolling back to the snapshot...")
+        with timed("rollback"):
+            restart_victim(snapshots.restore(VICTIM_DIR, snapshot))
+        print("Restart failed. Aborting.")
+        sys.exit(1)
 
     # STEP 5: VERIFICATION (The Final Test)
     print("\n--- PHASE 4: VERIFICATION ATTACK ---")
     print("(Running the exact same attack tools again to prove resilience...)")
-    run_docker_command(AGENT_CONTAINER, "attacker.py")
+    with timed("verify"):
+        run_agent_phase("attack")
 
     print("\n==================================================")
     print("      MISSION COMPLETE: SYSTEM HARDENED           ")
     print("==================================================")
 
 if __name__ == "__main__":
-    main_loop()
\ No newline at end of file
+    try:
+        main_loop()
+    finally:
+        print_timings()
\ No newline at end of file
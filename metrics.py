@@ -0,0 +1,85 @@
+# Prometheus text exposition (format 0.0.4) for the orchestrator's /metrics endpoint.
+# Everything is updated from the event loop thread, so no locking.
+DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+REGISTRY = []
+
+
+def _value(value):
+    # Full precision: {:g} keeps 6 digits, so big counters would stop moving
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., sum, count]
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labels)
+        series = self.series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (f'{bound:g}',))} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_value(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+def render():
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+MISSIONS = Counter("entropy_missions_total", "Missions finished, by final status.", ("status",))
+MISSION_SECONDS = Histogram("entropy_mission_duration_seconds", "Wall time from mission start to finish.",
+                            ("mode", "status"), buckets=DURATION_BUCKETS + (3600,))
+PHASE_SECONDS = Histogram("entropy_phase_duration_seconds", "Duration of each mission pipeline step.", ("phase",))
+STEP_SECONDS = Histogram("entropy_step_duration_seconds",
+                         "Duration of each external command or agent phase.", ("step", "outcome"))
+LLM_SECONDS = Histogram("entropy_llm_request_duration_seconds", "Latency of model calls made by the agent.",
+                        ("component", "model", "outcome"), buckets=(0.25, 0.5, 1, 2, 5, 10, 20, 40, 80, 160))
+LLM_TOKENS = Counter("entropy_llm_tokens_total", "Tokens used by agent model calls.", ("component", "kind"))
+LLM_REQUESTS = Counter("entropy_llm_requests_total", "Agent model calls, cache hits included.",
+                       ("component", "outcome"))
+
+
+def step_outcome(code):
+    return "timeout" if code is None else ("ok" if code == 0 else "error")
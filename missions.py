@@ -0,0 +1,381 @@
+import asyncio
+import itertools
+import os
+import secrets
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+
+# CONFIGURATION
+WORKERS = int(os.getenv("MISSION_WORKERS", "1"))
+WORKSPACE_ROOT = os.getenv("MISSION_WORKSPACE", "workspaces")
+BASE_VICTIM_PORT = int(os.getenv("VICTIM_BASE_PORT", "8080"))
+BASE_AGENT_PORT = int(os.getenv("AGENT_BASE_PORT", "7000"))  # agent daemon, published on localhost only
+LOG_CAPACITY = int(os.getenv("MISSION_LOG_LINES", "2000"))  # lines kept per mission
+LOG_LINE_MAX = int(os.getenv("MISSION_LOG_LINE_CHARS", "2000"))  # longer lines are clipped
+EVENT_CAPACITY = int(os.getenv("MISSION_EVENT_BUFFER", "4000"))  # replay window for stream subscribers
+HISTORY = int(os.getenv("MISSION_HISTORY", "100"))  # finished missions kept for /status; older ones are dropped
+
+
+class LogBuffer:
+    """
+    Fixed-size ring of log entries with monotonically increasing sequence numbers.
+    Memory is bounded by LOG_CAPACITY x LOG_LINE_MAX regardless of mission length;
+    pollers pass back the last `cursor` they saw to receive only newer lines.
+    """
+
+    def __init__(self, capacity=LOG_CAPACITY):
+        self.entries = deque(maxlen=capacity)
+        self.cursor = -1  # seq of the newest entry, -1 while empty
+
+    def append(self, message):
+        if len(message) > LOG_LINE_MAX:
+            message = message[:LOG_LINE_MAX] + "…"
+        self.cursor += 1
+        self.entries.append((self.cursor, message))
+        return self.cursor
+
+    def since(self, seq=-1):
+        """Returns (messages newer than seq, truncated) where truncated means some were evicted."""
+        if not self.entries or seq >= self.cursor:
+            return [], False
+        oldest = self.entries[0][0]
+        truncated = seq + 1 < oldest
+        skip = max(0, seq + 1 - oldest)
+        return [m for _, m in itertools.islice(self.entries, skip, None)], truncated
+
+
+class EventBus:
+    """
+    Broadcast channel for live mission events (log lines, phase/status changes, telemetry).
+    Events sit in a shared ring with increasing ids; subscribers don't get their own queues,
+    they read forward from their last id and sleep until the next publish. A slow consumer
+    therefore never blocks the mission, and one that falls out of the ring gets a "gap" event.
+    """
+
+    def __init__(self, capacity=EVENT_CAPACITY):
+        self.events = deque(maxlen=capacity)
+        self.last_id = -1
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def publish(self, kind, data):
+        self.last_id += 1
+        self.events.append((self.last_id, kind, data))
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def after(self, last_id):
+        """Returns (events newer than last_id, first missed id or None)."""
+        if not self.events or last_id >= self.last_id:
+            return [], None
+        oldest = self.events[0][0]
+        gap = last_id + 1 if last_id + 1 < oldest else None
+        skip = max(0, last_id + 1 - oldest)
+        return list(itertools.islice(self.events, skip, None)), gap
+
+    async def subscribe(self, last_id=-1, heartbeat=15.0):
+        """
+        Yields (id, kind, data) from last_id onwards until the bus closes.
+        Yields None every `heartbeat` seconds of silence so callers can ping/check the client.
+        """
+        while True:
+            changed = self._changed
+            batch, gap = self.after(last_id)
+            if gap is not None:
+                yield (batch[0][0] - 1 if batch else self.last_id, "gap", {"missed_from": gap})
+            for event in batch:
+                last_id = event[0]
+                yield event
+            if self.closed and last_id >= self.last_id:
+                return
+            try:
+                await asyncio.wait_for(changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+
+class Slot:
+    """
+    An isolated sandbox owned by one worker: its own victim/agent containers,
+    compose project (and therefore network) and working directory.
+    Slot 0 keeps the legacy names so a single-worker setup behaves exactly as before.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        if index == 0:
+            self.project = None
+            self.victim_container = "victim_container"
+            self.agent_container = "agent_container"
+            self.target_dir = "victim-app"
+        else:
+            self.project = f"entropy-slot{index}"
+            self.victim_container = f"victim_container_{index}"
+            self.agent_container = f"agent_container_{index}"
+            self.target_dir = os.path.join(WORKSPACE_ROOT, f"slot{index}", "victim-app")
+        self.victim_port = BASE_VICTIM_PORT + index
+        self.agent_port = BASE_AGENT_PORT + index
+        self.agent_token = secrets.token_hex(16)  # the agent daemon refuses requests without it
+
+    @property
+    def health_url(self):
+        return f"http://localhost:{self.victim_port}/api/health"
+
+    def compose(self, *args):
+        cmd = ["docker-compose"]
+        if self.project:
+            cmd += ["-p", self.project]
+        return cmd + list(args)
+
+    def compose_env(self):
+        # Consumed by the ${VAR:-default} placeholders in docker-compose.yml
+        return {
+            **os.environ,
+            "VICTIM_DIR": "./" + self.target_dir.replace(os.sep, "/"),
+            "VICTIM_CONTAINER": self.victim_container,
+            "AGENT_CONTAINER": self.agent_container,
+            "VICTIM_PORT": str(self.victim_port),
+            "AGENT_PORT": str(self.agent_port),
+            "AGENT_TOKEN": self.agent_token,
+            # Cache mounts in the injected Dockerfile need BuildKit (legacy docker-compose v1)
+            "DOCKER_BUILDKIT": "1",
+            "COMPOSE_DOCKER_CLI_BUILD": "1",
+        }
+
+
+def critical_path(spans):
+    """
+    Walks back from the span that finished last, always through the dependency that
+    finished latest (the one that actually held things up). Returns (path, slack) where
+    slack maps each finished span to how long its dependents still had to wait after it.
+    """
+    done = {name: span for name, span in spans.items() if span["end"] is not None}
+    if not done:
+        return [], {}
+    path = []
+    name = max(done, key=lambda n: done[n]["end"])
+    while name is not None:
+        path.append(name)
+        deps = [d for d in done[name]["after"] if d in done]
+        name = max(deps, key=lambda d: done[d]["end"]) if deps else None
+    path.reverse()
+
+    slack = {}
+    for name, span in done.items():
+        dependents = [s["start"] for s in done.values() if name in s["after"]]
+        slack[name] = round(min(dependents) - span["end"], 2) if dependents else 0.0
+    return path, slack
+
+
+class Mission:
+    """State of one /deploy request, from queueing to completion."""
+
+    def __init__(self, repo_url, user_id=None, ref=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.repo_url = repo_url
+        self.user_id = user_id
+        self.ref = ref
+        self.commit = None
+        self.build_seconds = None
+        self.spans = {}  # pipeline step -> {"start", "end", "after"}
+        self.steps = []  # every external command / agent phase: {"step", "seconds", "outcome"}
+        self.llm = {}  # agent component -> model call totals
+        self.mode = "DASHBOARD" if user_id else "LIGHTNING"
+        self.events = EventBus()
+        self._status = "QUEUED"
+        self._phase = "READY"
+        self.logs = LogBuffer()
+        self.vulnerabilities = []
+        self.telemetry = {"cpu": 0, "memory": 0}
+        self.collector = None
+        self.slot = None
+        self.task = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def log(self, message):
+        print(f"[{self.id}] {message}")
+        seq = self.logs.append(message)
+        self.events.publish("log", {"seq": seq, "message": message})
+
+    @contextmanager
+    def span(self, name, after=()):
+        """Times one pipeline step; `after` names the steps it had to wait for."""
+        self.spans[name] = {"start": time.time(), "end": None, "after": tuple(after)}
+        try:
+            yield
+        finally:
+            span = self.spans[name]
+            span["end"] = time.time()
+            metrics.PHASE_SECONDS.observe(span["end"] - span["start"], phase=name)
+
+    def record_step(self, step, seconds, code):
+        outcome = metrics.step_outcome(code)
+        self.steps.append({"step": step, "seconds": round(seconds, 3), "outcome": outcome})
+        metrics.STEP_SECONDS.observe(seconds, step=step, outcome=outcome)
+
+    def record_metric(self, data):
+        """Folds one "[METRIC]" record streamed by the agent into mission totals and /metrics."""
+        if data.get("kind") != "llm":
+            return
+        component, outcome = data.get("component", "unknown"), data.get("outcome", "ok")
+        totals = self.llm.setdefault(component, {"calls": 0, "cached": 0, "errors": 0, "seconds": 0.0,
+                                                 "prompt_tokens": 0, "output_tokens": 0, "thinking_tokens": 0})
+        totals["calls"] += 1
+        totals["cached"] += outcome == "cached"
+        totals["errors"] += outcome == "error"
+        metrics.LLM_REQUESTS.inc(component=component, outcome=outcome)
+        if data.get("seconds") is not None:
+            totals["seconds"] = round(totals["seconds"] + data["seconds"], 3)
+            metrics.LLM_SECONDS.observe(data["seconds"], component=component,
+                                        model=data.get("model", ""), outcome=outcome)
+        for kind in ("prompt", "output", "thinking"):
+            tokens = data.get(f"{kind}_tokens") or 0
+            totals[f"{kind}_tokens"] += tokens
+            if tokens:
+                metrics.LLM_TOKENS.inc(tokens, component=component, kind=kind)
+
+    def timings(self):
+        path, slack = critical_path(self.spans)
+        origin = min((s["start"] for s in self.spans.values()), default=0)
+        steps = {
+            name: {"start_s": round(s["start"] - origin, 2),
+                   "seconds": round(s["end"] - s["start"], 2) if s["end"] else None,
+                   "after": list(s["after"]), "slack_s": slack.get(name)}
+            for name, s in self.spans.items()
+        }
+        last = self.spans[path[-1]]["end"] if path else origin
+        return {"steps": steps, "critical_path": path, "total_seconds": round(last - origin, 2)}
+
+    @property
+    def phase(self):
+        return self._phase
+
+    @phase.setter
+    def phase(self, value):
+        if value != self._phase:
+            self._phase = value
+            self.events.publish("phase", {"phase": value})
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        if value != self._status:
+            self._status = value
+            self.events.publish("status", {"status": value})
+            if value == "RUNNING":
+                self.started_at = time.time()
+            elif value != "QUEUED":
+                metrics.MISSIONS.inc(status=value)
+                if self.started_at:
+                    metrics.MISSION_SECONDS.observe(time.time() - self.started_at, mode=self.mode, status=value)
+                self.events.close()
+
+    @property
+    def active(self):
+        return self.status in ("QUEUED", "RUNNING")
+
+    def to_dict(self, since=-1):
+        logs, truncated = self.logs.since(since)
+        return {
+            "id": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "logs": logs,
+            "cursor": self.logs.cursor,
+            "logs_truncated": truncated,
+            "vulnerabilities": self.vulnerabilities,
+            "telemetry": self.telemetry,
+            "current_repo": self.repo_url,
+            "ref": self.ref,
+            "commit": self.commit,
+            "build_seconds": self.build_seconds,
+            "timings": self.timings(),
+            "metrics": {"steps": self.steps, "llm": self.llm},
+            "mode": self.mode,
+            "slot": self.slot.index if self.slot else None,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class Scheduler:
+    """FIFO mission queue drained by a fixed pool of workers, one Slot each."""
+
+    def __init__(self, runner, workers=WORKERS, history=HISTORY):
+        self.runner = runner  # async def runner(mission, slot)
+        self.slots = [Slot(i) for i in range(workers)]
+        self.queue = asyncio.Queue()
+        self.missions = {}
+        self.workers = []
+        self.history = history
+
+    def start(self):
+        self.workers = [asyncio.create_task(self._work(slot)) for slot in self.slots]
+
+    async def stop(self):
+        for mission in self.missions.values():
+            if mission.task and not mission.task.done():
+                mission.task.cancel()
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+
+    def submit(self, repo_url, user_id=None, ref=None):
+        mission = Mission(repo_url, user_id, ref)
+        self.missions[mission.id] = mission
+        self.queue.put_nowait(mission)
+        return mission
+
+    def cancel(self, mission):
+        if mission.status == "QUEUED":
+            # Workers skip cancelled entries when they reach the head of the queue
+            mission.status = "CANCELLED"
+            mission.finished_at = time.time()
+            self._forget_finished()
+        elif mission.task and not mission.task.done():
+            mission.task.cancel()
+
+    def latest(self):
+        return max(self.missions.values(), key=lambda m: m.created_at, default=None)
+
+    def queue_position(self, mission):
+        queued = [m for m in self.missions.values() if m.status == "QUEUED"]
+        queued.sort(key=lambda m: m.created_at)
+        return queued.index(mission) if mission in queued else None
+
+    async def _work(self, slot):
+        while True:
+            mission = await self.queue.get()
+            try:
+                if mission.status != "QUEUED":
+                    continue
+                mission.slot = slot
+                mission.task = asyncio.create_task(self.runner(mission, slot))
+                await asyncio.gather(mission.task, return_exceptions=True)
+            finally:
+                mission.finished_at = mission.finished_at or time.time()
+                self._forget_finished()
+                self.queue.task_done()
+
+    def _forget_finished(self):
+        """Keeps only the `history` most recently finished missions (with their logs and events)."""
+        finished = sorted((m for m in self.missions.values() if not m.active),
+                          key=lambda m: m.finished_at or m.created_at, reverse=True)
+        for mission in finished[self.history:]:
+            del self.missions[mission.id]
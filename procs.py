@@ -0,0 +1,75 @@
+import asyncio
+
+
+class StepTimeout(Exception):
+    """Raised when an external step exceeds its time budget."""
+
+
+async def read_lines(stream, size=65536):
+    """
+    Yields the decoded lines of a StreamReader. Splits chunks itself: `async for` over the
+    reader raises on lines over 64 KiB (Maven output, stack traces, one-line JSON dumps).
+    """
+    pending = b""
+    while chunk := await stream.read(size):
+        *lines, pending = (pending + chunk).split(b"\n")
+        for raw in lines:
+            yield raw.decode(errors="replace")
+    if pending:
+        yield pending.decode(errors="replace")
+
+
+async def _pump(stream, on_line):
+    async for line in read_lines(stream):
+        line = line.rstrip()
+        if line and on_line:
+            on_line(line)
+
+
+async def _kill(proc, kill_cmd=None):
+    if proc.returncode is None:
+        proc.terminate()
+        try:
+            await asyncio.wait_for(proc.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+    if kill_cmd:
+        # Killing a `docker exec` client leaves its process running in the container
+        try:
+            killer = await asyncio.create_subprocess_exec(*kill_cmd, stdout=asyncio.subprocess.DEVNULL,
+                                                          stderr=asyncio.subprocess.DEVNULL)
+            await asyncio.wait_for(killer.wait(), timeout=10)
+        except (OSError, asyncio.TimeoutError):
+            pass
+
+
+async def run_step(cmd, timeout=None, on_line=None, on_err=None, cwd=None, env=None, kill_cmd=None):
+    """
+    Runs an external command without blocking the event loop.
+    stdout/stderr are streamed line by line to `on_line`/`on_err` as they arrive.
+    The child is killed if the step times out (StepTimeout) or the caller is cancelled,
+    and `kill_cmd` is run then to stop whatever the child started elsewhere (in a container).
+    Returns the exit code.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+        env=env,
+    )
+    pumps = asyncio.gather(_pump(proc.stdout, on_line), _pump(proc.stderr, on_err))
+    try:
+        await asyncio.wait_for(asyncio.shield(pumps), timeout)
+        return await proc.wait()
+    except asyncio.TimeoutError:
+        await _kill(proc, kill_cmd)
+        raise StepTimeout(f"{' '.join(cmd)} exceeded {timeout:g}s")
+    except asyncio.CancelledError:
+        await _kill(proc, kill_cmd)
+        raise
+    finally:
+        if not pumps.done():
+            pumps.cancel()
+            await asyncio.gather(pumps, return_exceptions=True)
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import random
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+from procs import read_lines
+
+# CONFIGURATION
+HEALTH_URL = os.getenv("VICTIM_HEALTH_URL", "http://localhost:8080/api/health")
+READY_DEADLINE = float(os.getenv("VICTIM_READY_DEADLINE", "180"))  # seconds
+STARTED_MARKER = "Started "  # Spring Boot: "Started VulnerableApplication in 4.2 seconds"
+BACKOFF_START = 0.25
+BACKOFF_MAX = 3.0
+RETAIL_DELAY = 0.5  # before following the log again when it ended on a running container
+
+
+def probe_health(url, timeout=2):
+    """Single blocking health probe. True only on HTTP 200."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            return r.status == 200
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+async def _poll_health(url, ready):
+    delay = BACKOFF_START
+    while not ready.is_set():
+        if await asyncio.to_thread(probe_health, url):
+            return "health check"
+        # Exponential backoff with jitter so parallel missions don't probe in lockstep
+        await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+        delay = min(delay * 1.6, BACKOFF_MAX)
+
+
+async def _tail_startup_log(container, since):
+    cmd = ["docker", "logs", "-f", "--since", since, container]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+    )
+    try:
+        async for line in read_lines(proc.stdout):
+            if STARTED_MARKER in line:
+                return "startup log"
+        # Stream ended: the container exited, or wasn't running yet when we attached
+        return None
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+
+async def _is_running(container):
+    proc = await asyncio.create_subprocess_exec(
+        "docker", "inspect", "-f", "{{.State.Running}}", container,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    out, _ = await proc.communicate()
+    return out.decode().strip() == "true"
+
+
+async def _watch_startup_log(container, since):
+    """Follows the log until the "Started" line, or returns None once the container has stopped."""
+    while True:
+        source = await _tail_startup_log(container, since)
+        if source is not None or not await _is_running(container):
+            return source
+        await asyncio.sleep(RETAIL_DELAY)
+
+
+async def wait_for_victim(container, health_url=HEALTH_URL, since=None,
+                          deadline=READY_DEADLINE, log=print):
+    """
+    Returns True as soon as the victim is up, either because /api/health answers 200
+    or because the container logged Spring's "Started" line after `since` (epoch seconds).
+    Returns False if the container dies or the deadline passes first.
+    """
+    start = time.monotonic()
+    since = since if since is not None else time.time()
+    since_iso = datetime.fromtimestamp(since, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    ready = asyncio.Event()
+
+    health_task = asyncio.create_task(_poll_health(health_url, ready))
+    log_task = asyncio.create_task(_watch_startup_log(container, since_iso))
+    pending = {health_task, log_task}
+    source = None
+    try:
+        async with asyncio.timeout(deadline):
+            while pending and source is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    source = source or task.result()
+                if source is None and log_task in done:
+                    # Container stopped without a "Started" line: the JVM exited
+                    break
+    except TimeoutError:
+        log(f"Victim not ready after {deadline:.0f}s deadline.")
+        return False
+    finally:
+        ready.set()
+        for task in (health_task, log_task):
+            task.cancel()
+        await asyncio.gather(health_task, log_task, return_exceptions=True)
+
+    elapsed = time.monotonic() - start
+    if source is None:
+        log(f"Victim container exited during startup ({elapsed:.1f}s).")
+        return False
+    log(f"Victim ready in {elapsed:.1f}s (via {source}).")
+    return True
+
+
+def wait_for_victim_sync(container, health_url=HEALTH_URL, since=None,
+                         deadline=READY_DEADLINE, log=print):
+    """Blocking wrapper for the CLI orchestrator."""
+    return asyncio.run(wait_for_victim(container, health_url, since, deadline, log))
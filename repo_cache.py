@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import stat
+
+from procs import run_step
+
+# CONFIGURATION
+CACHE_ROOT = os.getenv("REPO_CACHE_DIR", os.path.join(".entropy-cache", "repos"))
+SYNC_RECORD = "entropy-sync.json"  # lives inside the work tree's .git so `git clean` keeps it
+
+_locks = {}
+
+
+class SyncError(Exception):
+    """Raised when a git step fails while syncing a target repo."""
+
+
+def _remove_readonly(func, path, exc):
+    os.chmod(path, stat.S_IWRITE)
+    func(path)
+
+
+def mirror_path(repo_url):
+    key = hashlib.sha256(repo_url.encode()).hexdigest()[:16]
+    return os.path.join(CACHE_ROOT, key + ".git")
+
+
+async def _git(*args, timeout=None, log=print):
+    out, err = [], []
+    code = await run_step(["git", *args], timeout=timeout, on_line=out.append, on_err=err.append)
+    if code != 0:
+        for line in err[-5:]:
+            log(f"   git: {line}")
+        raise SyncError(f"git {args[0]} failed (exit {code})")
+    return out
+
+
+def read_record(target_dir):
+    try:
+        with open(os.path.join(target_dir, ".git", SYNC_RECORD)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_record(target_dir, record):
+    with open(os.path.join(target_dir, ".git", SYNC_RECORD), "w") as f:
+        json.dump(record, f, indent=2)
+
+
+async def update_mirror(repo_url, ref="HEAD", timeout=None, log=print):
+    """Fetches `ref` of repo_url into the local bare mirror and returns the resolved commit SHA."""
+    mirror = mirror_path(repo_url)
+    if not os.path.isdir(mirror):
+        os.makedirs(CACHE_ROOT, exist_ok=True)
+        await _git("init", "--bare", "--quiet", mirror, timeout=timeout, log=log)
+    await _git("-C", mirror, "fetch", "--depth", "1", "--quiet", repo_url, ref, timeout=timeout, log=log)
+    sha = (await _git("-C", mirror, "rev-parse", "FETCH_HEAD", timeout=timeout, log=log))[0].strip()
+    # Keep the commit reachable so later local fetches by SHA always work
+    await _git("-C", mirror, "update-ref", f"refs/entropy/{sha}", sha, timeout=timeout, log=log)
+    return sha
+
+
+async def sync_repo(repo_url, target_dir, ref="HEAD", timeout=None, log=print):
+    """
+    Brings target_dir to the commit `ref` resolves to, reusing the cached mirror and
+    updating the existing work tree in place (fetch + hard reset + clean) when possible.
+    Returns (sha, previous_record) so callers can tell whether anything changed.
+    """
+    lock = _locks.setdefault(repo_url, asyncio.Lock())
+    async with lock:
+        sha = await update_mirror(repo_url, ref, timeout=timeout, log=log)
+    mirror = os.path.abspath(mirror_path(repo_url))
+
+    previous = read_record(target_dir)
+    if previous.get("repo_url") != repo_url or not os.path.isdir(os.path.join(target_dir, ".git")):
+        # Different repo (or not a standalone checkout): start from an empty tree
+        if os.path.exists(target_dir):
+            await asyncio.to_thread(shutil.rmtree, target_dir, onexc=_remove_readonly)
+        os.makedirs(target_dir)
+        await _git("init", "--quiet", target_dir, timeout=timeout, log=log)
+        previous = {}
+
+    await _git("-C", target_dir, "fetch", "--depth", "1", "--quiet", mirror, sha, timeout=timeout, log=log)
+    await _git("-C", target_dir, "reset", "--hard", "--quiet", sha, timeout=timeout, log=log)
+    await _git("-C", target_dir, "clean", "-ffdxq", timeout=timeout, log=log)
+    return sha, previous
+
+
+async def tree_sha(target_dir):
+    """Git tree hash of HEAD: a free content hash of every committed source file."""
+    return (await _git("-C", target_dir, "rev-parse", "HEAD^{tree}"))[0].strip()
+
+
+def file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
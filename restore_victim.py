@@ -1,8 +1,12 @@
 import os
+import sys
+
+from snapshots import SnapshotStore
 
 # CONFIGURATION
 BASE_DIR = "victim-app/src/main/java/com/entropy/victim"
 ROOT_DIR = "victim-app"
+PRISTINE_TAG = "victim-app-pristine"  # snapshot of the tree as these strings left it
 
 # FILE 1: The Main Application
 APP_CODE = """package com.entropy.victim;
@@ -115,7 +119,15 @@ POM_XML = """<?xml version="1.0" encoding="UTF-8"?>
 </project>
 """
 
-def restore():
+def restore(fresh=False):
+    # 0. Fast path: put back exactly the files that changed since the pristine snapshot
+    store = SnapshotStore()
+    pristine = store.resolve(PRISTINE_TAG)
+    if pristine and not fresh:
+        changed = store.restore(ROOT_DIR, pristine)
+        print(f"Restored {len(changed)} file(s) from snapshot {pristine[:12]}: {', '.join(changed) or 'already pristine'}")
+        return
+
     # 1. Create directory structure
     print(f"Creating directory: {BASE_DIR}...")
     os.makedirs(BASE_DIR, exist_ok=True)
@@ -132,7 +144,10 @@ def restore():
         f.write(POM_XML)
         
     print(f"Restored Java files + POM.xml")
+    snapshot = store.take(ROOT_DIR, tag=PRISTINE_TAG)
+    print(f"Saved as snapshot {snapshot[:12]}; later restores only rewrite what changed.")
     print("\nReady! Now push to GitHub.")
 
 if __name__ == "__main__":
-    restore()
\ No newline at end of file
+    # --fresh rewrites the hardcoded sources and re-takes the pristine snapshot
+    restore(fresh="--fresh" in sys.argv)
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+Hot redeploy of a healed victim. Only the changed sources are recompiled, inside the
+running container, against the app's own BOOT-INF/lib. The classes are swapped in
+place and only the JVM is restarted: seconds instead of an image rebuild, and the
+verification attack hits the patched bytecode. This needs the exploded-jar image from
+the injected Dockerfile. Any other change (pom.xml, Dockerfile, a non-standard layout)
+falls back to a full rebuild.
+"""
+import os
+import time
+
+from procs import run_step
+
+# CONFIGURATION
+# A VERIFY run counts as a regression (and the patch is rolled back) when it crashes a
+# victim the baseline didn't, loses availability, or slows an attacked endpoint down
+REGRESSION_AVAILABILITY_DROP = float(os.getenv("REGRESSION_AVAILABILITY_DROP", "0.05"))
+REGRESSION_P99_FACTOR = float(os.getenv("REGRESSION_P99_FACTOR", "2"))
+REGRESSION_P99_FLOOR_MS = float(os.getenv("REGRESSION_P99_FLOOR_MS", "100"))  # ignore noise below this
+JAVA_ROOT = "src/main/java/"
+RESOURCE_ROOT = "src/main/resources/"
+SOURCE_MOUNT = "/app/source-code"  # where docker-compose mounts the victim's sources
+UNSUPPORTED = 3  # redeploy exit code: this image has no exploded app, rebuild instead
+
+# Run with `sh -c` inside the victim. Args: "java"|"res" markers followed by paths
+# relative to the source mount. Compiles into a scratch dir first, so a failed compile
+# leaves the running app untouched. The JVM supervisor in the image (see
+# DOCKERFILE_TEMPLATE) restarts the JVM when it exits with the redeploy flag set.
+REDEPLOY_SCRIPT = r"""
+set -e
+app=/app/exploded
+[ -d "$app/BOOT-INF/classes" ] || exit 3
+# A container that was just started may not have launched its JVM yet
+for i in $(seq 50); do [ -f /tmp/entropy-jvm.pid ] && break; sleep 0.2; done
+[ -f /tmp/entropy-jvm.pid ] || exit 3
+cd "$0"
+sources=""; resources=""; kind=""
+for arg in "$@"; do
+    case "$arg" in
+        java|res) kind=$arg ;;
+        *) if [ "$kind" = java ]; then sources="$sources $arg"; else resources="$resources $arg"; fi ;;
+    esac
+done
+out=$(mktemp -d)
+if [ -n "$sources" ]; then
+    javac -nowarn -proc:none -encoding UTF-8 -parameters -d "$out" \
+        -cp "$app/BOOT-INF/classes:$app/BOOT-INF/lib/*" -sourcepath src/main/java $sources
+fi
+for f in $resources; do
+    mkdir -p "$out/$(dirname "${f#src/main/resources/}")"
+    cp "$f" "$out/${f#src/main/resources/}"
+done
+# Drop stale nested classes of every recompiled class, then swap the new ones in
+find "$out" -name '*.class' ! -name '*$*' | while read -r f; do
+    rm -f "$app/BOOT-INF/classes/${f#$out/}"
+    rm -f "$app/BOOT-INF/classes/$(dirname "${f#$out/}")/$(basename "$f" .class)\$"*.class
+done
+count=$(find "$out" -type f | wc -l)
+cp -r "$out"/. "$app/BOOT-INF/classes/"
+rm -rf "$out"
+echo "Swapped $count file(s). Restarting the JVM..."
+pid=$(cat /tmp/entropy-jvm.pid)
+touch /tmp/entropy-redeploy
+kill "$pid"
+# Return only once the old JVM is gone, so readiness checks can't be answered by it
+while kill -0 "$pid" 2>/dev/null; do sleep 0.1; done
+"""
+
+
+def plan(files):
+    """
+    Splits changed paths (relative to the repo root) into (sources, resources) the hot
+    path can deploy. Returns None when something changed that only a rebuild can pick up.
+    """
+    sources, resources = [], []
+    for path in files:
+        if path.startswith(JAVA_ROOT) and path.endswith(".java"):
+            sources.append(path)
+        elif path.startswith(RESOURCE_ROOT):
+            resources.append(path)
+        else:
+            return None
+    return sources, resources
+
+
+def redeploy_command(container, sources, resources):
+    return ["docker", "exec", container, "sh", "-c", REDEPLOY_SCRIPT, SOURCE_MOUNT,
+            "java", *sources, "res", *resources]
+
+
+async def changed_files(target_dir):
+    """Paths changed in the work tree since the checked-out commit (the one the image was built from)."""
+    out = []
+    code = await run_step(["git", "-C", target_dir, "diff", "--name-only", "--relative", "HEAD"],
+                          timeout=30, on_line=out.append)
+    return out if code == 0 else None
+
+
+async def is_running(container):
+    out = []
+    await run_step(["docker", "inspect", "-f", "{{.State.Running}}", container], timeout=30, on_line=out.append)
+    return out == ["true"]
+
+
+async def redeploy(container, target_dir, log=print, run=run_step, files=None):
+    """
+    Hot-swaps changed files into the victim: `files`, or else the work tree's changes
+    since HEAD. Returns the time the patched JVM began starting (to wait for readiness
+    from), or None when a full rebuild is needed. `run` executes the docker commands
+    (the orchestrator passes its step runner).
+    """
+    if files is None:
+        files = await changed_files(target_dir)
+    if files is None:
+        log("Can't tell what changed (not a git work tree). Falling back to a full rebuild.")
+        return None
+    # A file the patch added and a rollback deleted has nothing to compile
+    files = [f for f in files if os.path.exists(os.path.join(target_dir, f))]
+    deployable = plan(files)
+    if deployable is None:
+        log("Changes go beyond Java sources and resources. Falling back to a full rebuild.")
+        return None
+    if not files:
+        log("No source changes to deploy. Restarting the JVM only.")
+
+    sources, resources = deployable
+    started = time.time()
+    if not await is_running(container):
+        # Crashed by the attack: bring the container back so the patch can be compiled in it
+        log("Victim is down. Starting its container...")
+        if await run(["docker", "start", container], on_err=log) != 0:
+            return None
+    log(f"Hot-deploying {len(sources)} source(s) and {len(resources)} resource(s)...")
+    code = await run(redeploy_command(container, sources, resources), on_line=log, on_err=log)
+    if code == UNSUPPORTED:
+        log("Victim image has no exploded app (custom Dockerfile?). Falling back to a full rebuild.")
+        return None
+    if code != 0:
+        log(f"Hot redeploy failed (exit {code}). Falling back to a full rebuild.")
+        return None
+    log(f"Patched classes swapped in {time.time() - started:.1f}s.")
+    # The old JVM has exited by now, so any "Started" line after this is the patched one
+    return time.time()
+
+
+def regressions(baseline, verify):
+    """Reasons the VERIFY report is worse than the baseline attack report (empty when it isn't)."""
+    found = []
+    if verify.get("outcome") == "crashed" and baseline.get("outcome") != "crashed":
+        found.append("the patched victim crashed under attacks the original survived")
+
+    before = (baseline.get("monitor") or {}).get("availability")
+    after = (verify.get("monitor") or {}).get("availability")
+    if before is not None and after is not None and before - after > REGRESSION_AVAILABILITY_DROP:
+        found.append(f"availability fell from {before:.2%} to {after:.2%}")
+
+    baseline_attacks = {a.get("name"): a for a in baseline.get("attacks", [])}
+    for attack in verify.get("attacks", []):
+        old = (baseline_attacks.get(attack.get("name")) or {}).get("latency_ms", {}).get("p99")
+        new = attack.get("latency_ms", {}).get("p99")
+        if old and new and new > REGRESSION_P99_FLOOR_MS and new > old * REGRESSION_P99_FACTOR:
+            found.append(f"'{attack['name']}' p99 went from {old:g}ms to {new:g}ms")
+    return found
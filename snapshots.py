@@ -0,0 +1,173 @@
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+# CONFIGURATION
+SNAPSHOT_ROOT = os.getenv("SNAPSHOT_DIR", os.path.join(".entropy-cache", "snapshots"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "50"))  # manifests kept by prune(); tags are always kept
+IGNORED_DIRS = {".git", "target", "build", "node_modules"}
+
+
+class SnapshotStore:
+    """
+    Content-addressed snapshots of a source tree. Every file is stored once as a blob
+    named by its SHA-256, so snapshots of mostly-unchanged trees (one per heal, across
+    every slot) share storage. A snapshot is a manifest {path: [sha, mode]} whose id is
+    the hash of the manifest itself. Restoring rewrites only the files that differ.
+    """
+
+    def __init__(self, root=SNAPSHOT_ROOT):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self.manifests = os.path.join(root, "manifests")
+        self.tags = os.path.join(root, "tags")
+        for directory in (self.objects, self.manifests, self.tags):
+            os.makedirs(directory, exist_ok=True)
+
+    def _blob(self, sha):
+        return os.path.join(self.objects, sha[:2], sha)
+
+    def _walk(self, tree):
+        for dirpath, dirnames, filenames in os.walk(tree):
+            dirnames[:] = sorted(d for d in dirnames if d not in IGNORED_DIRS)
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    yield os.path.relpath(path, tree).replace(os.sep, "/"), path
+
+    def _write(self, path, data):
+        # Atomic, so a concurrent reader never sees half a file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def take(self, tree, tag=None):
+        """Snapshots `tree` and returns the snapshot id. Only blobs not already stored are written."""
+        manifest = {}
+        for rel, path in self._walk(tree):
+            with open(path, "rb") as f:
+                data = f.read()
+            sha = hashlib.sha256(data).hexdigest()
+            blob = self._blob(sha)
+            try:
+                os.utime(blob)  # reused: a concurrent prune() now sees it as fresh and leaves it
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                self._write(blob, data)
+            manifest[rel] = [sha, os.stat(path).st_mode & 0o777]
+
+        encoded = json.dumps(manifest, sort_keys=True).encode()
+        snapshot = hashlib.sha256(encoded).hexdigest()
+        path = os.path.join(self.manifests, snapshot + ".json")
+        if os.path.exists(path):
+            os.utime(path)  # keeps it young for prune()
+        else:
+            self._write(path, encoded)
+        if tag:
+            self.tag(tag, snapshot)
+        return snapshot
+
+    def load(self, snapshot):
+        with open(os.path.join(self.manifests, snapshot + ".json")) as f:
+            return json.load(f)
+
+    def tag(self, name, snapshot):
+        self._write(os.path.join(self.tags, name), snapshot.encode())
+
+    def resolve(self, name):
+        """Snapshot id for a tag, or None."""
+        try:
+            with open(os.path.join(self.tags, name)) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def restore(self, tree, snapshot):
+        """
+        Makes `tree` match the snapshot: files that differ are rewritten, files it doesn't
+        have are removed (ignored directories are left alone). Returns the changed paths.
+        """
+        manifest = self.load(snapshot)
+        changed = []
+        for rel, path in self._walk(tree):
+            if rel not in manifest:
+                os.remove(path)
+                changed.append(rel)
+        for rel, (sha, mode) in manifest.items():
+            path = os.path.join(tree, *rel.split("/"))
+            try:
+                if os.path.getsize(path) == os.path.getsize(self._blob(sha)):
+                    with open(path, "rb") as f:
+                        if hashlib.sha256(f.read()).hexdigest() == sha:
+                            continue
+            except OSError:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(self._blob(sha), "rb") as f:
+                self._write(path, f.read())
+            os.chmod(path, mode)
+            changed.append(rel)
+        return changed
+
+    def diff(self, snapshot, tree):
+        """Paths that differ between a snapshot and the tree as it is now."""
+        before = self.load(snapshot)
+        after = {rel: path for rel, path in self._walk(tree)}
+        changed = [rel for rel in before if rel not in after]
+        for rel, path in after.items():
+            with open(path, "rb") as f:
+                if rel not in before or hashlib.sha256(f.read()).hexdigest() != before[rel][0]:
+                    changed.append(rel)
+        return sorted(changed)
+
+    def prune(self, keep=SNAPSHOT_KEEP):
+        """Drops all but the `keep` newest untagged snapshots, then every blob nothing refers to."""
+        # One prune at a time across slots and processes; take() and restore() don't need it
+        with open(os.path.join(self.root, "prune.lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            tagged = {self.resolve(name) for name in os.listdir(self.tags)}
+            manifests = sorted((name for name in os.listdir(self.manifests) if name.endswith(".json")),
+                               key=lambda name: _mtime(os.path.join(self.manifests, name)), reverse=True)
+            kept = 0
+            for name in manifests:
+                if name[:-len(".json")] in tagged:
+                    continue
+                kept += 1
+                if kept > keep:
+                    _remove(os.path.join(self.manifests, name))
+
+            live = set()
+            for name in os.listdir(self.manifests):
+                if name.endswith(".json"):
+                    try:
+                        live.update(sha for sha, _ in self.load(name[:-len(".json")]).values())
+                    except FileNotFoundError:
+                        pass
+            for prefix in os.listdir(self.objects):
+                directory = os.path.join(self.objects, prefix)
+                for sha in os.listdir(directory):
+                    # Skip fresh blobs: a concurrent take() may not have written its manifest yet
+                    path = os.path.join(directory, sha)
+                    if sha not in live and time.time() - _mtime(path) > 3600:
+                        _remove(path)
+
+
+def _mtime(path):
+    """mtime, or 0 for a file that's already gone (it sorts and ages as oldest)."""
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import re
+import time
+from collections import deque
+
+from procs import read_lines
+
+# CONFIGURATION
+SAMPLE_INTERVAL = float(os.getenv("TELEMETRY_INTERVAL", "1.0"))  # seconds between kept samples
+CAPACITY = int(os.getenv("TELEMETRY_SAMPLES", "3600"))  # ring size (1h at 1 sample/s)
+
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+SIZE_UNITS = {
+    "b": 1, "kb": 1e3, "mb": 1e6, "gb": 1e9, "tb": 1e12,
+    "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4,
+}
+METRICS = ("cpu", "memory", "memory_mb", "threads", "net_rx_kb", "net_tx_kb")
+
+
+def parse_size(text):
+    """'123.4MiB' -> bytes."""
+    match = re.match(r"\s*([\d.]+)\s*([a-zA-Z]*)", text)
+    if not match:
+        return 0.0
+    value, unit = match.groups()
+    return float(value) * SIZE_UNITS.get(unit.lower() or "b", 1)
+
+
+def parse_stats_line(line):
+    """One `docker stats --format '{{json .}}'` record -> sample dict, or None."""
+    line = ANSI_ESCAPE.sub("", line).strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        raw = json.loads(line)
+        rx, _, tx = raw.get("NetIO", "0B / 0B").partition("/")
+        return {
+            "cpu": float(raw["CPUPerc"].rstrip("%") or 0),
+            "memory": float(raw["MemPerc"].rstrip("%") or 0),
+            "memory_mb": round(parse_size(raw["MemUsage"].split("/")[0]) / 1024 ** 2, 1),
+            "threads": int(raw.get("PIDs") or 0),  # PIDs counts JVM threads too
+            "net_rx_kb": round(parse_size(rx) / 1e3, 1),
+            "net_tx_kb": round(parse_size(tx) / 1e3, 1),
+        }
+    except (KeyError, ValueError):
+        return None
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class TelemetryCollector:
+    """
+    Samples a container's CPU, memory, threads and network I/O from a streamed
+    `docker stats` into a fixed-size time series tagged with the mission phase.
+    """
+
+    def __init__(self, mission, container, interval=SAMPLE_INTERVAL, capacity=CAPACITY):
+        self.mission = mission
+        self.container = container
+        self.interval = interval
+        self.samples = deque(maxlen=capacity)
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def record(self, sample, now=None):
+        now = time.time() if now is None else now
+        if self.samples and now - self.samples[-1]["t"] < self.interval:
+            return False
+        sample = {"t": round(now, 3), "phase": self.mission.phase, **sample}
+        self.samples.append(sample)
+        self.mission.telemetry = {"cpu": sample["cpu"], "memory": sample["memory"],
+                                  "threads": sample["threads"]}
+        self.mission.events.publish("telemetry", sample)
+        return True
+
+    async def _collect(self):
+        cmd = ["docker", "stats", "--format", "{{json .}}", self.container]
+        while True:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                async for line in read_lines(proc.stdout):
+                    sample = parse_stats_line(line)
+                    if sample:
+                        self.record(sample)
+            finally:
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+            # Stream ended (container restarting during HEAL, daemon hiccup): reattach
+            await asyncio.sleep(self.interval)
+
+    def series(self, points=120):
+        """Downsamples the buffer to at most `points` buckets (mean per metric, plus peak CPU)."""
+        samples = list(self.samples)
+        if len(samples) <= points:
+            return samples
+        size = len(samples) / points
+        out = []
+        for i in range(points):
+            bucket = samples[int(i * size):int((i + 1) * size)] or samples[int(i * size):int(i * size) + 1]
+            entry = {"t": bucket[-1]["t"], "phase": bucket[-1]["phase"]}
+            for key in METRICS:
+                entry[key] = round(sum(s[key] for s in bucket) / len(bucket), 2)
+            entry["cpu_max"] = max(s["cpu"] for s in bucket)
+            out.append(entry)
+        return out
+
+    def phase_stats(self):
+        """Peak and p95 per metric for every phase seen, e.g. ATTACK vs VERIFY."""
+        by_phase = {}
+        for s in self.samples:
+            by_phase.setdefault(s["phase"], []).append(s)
+        stats = {}
+        for phase, samples in by_phase.items():
+            entry = {"samples": len(samples), "seconds": round(samples[-1]["t"] - samples[0]["t"], 1)}
+            for key in ("cpu", "memory", "memory_mb", "threads"):
+                values = [s[key] for s in samples]
+                entry[f"{key}_peak"] = max(values)
+                entry[f"{key}_p95"] = percentile(values, 95)
+            stats[phase] = entry
+        return stats
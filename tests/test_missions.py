@@ -0,0 +1,127 @@
+import asyncio
+
+import missions
+from missions import EventBus, LogBuffer, critical_path
+
+
+def test_log_buffer_returns_only_lines_after_the_cursor():
+    logs = LogBuffer(capacity=10)
+    assert logs.since() == ([], False)
+    for i in range(3):
+        logs.append(f"line {i}")
+    assert logs.since() == (["line 0", "line 1", "line 2"], False)
+    assert logs.since(0) == (["line 1", "line 2"], False)
+    assert logs.since(logs.cursor) == ([], False)
+
+
+def test_log_buffer_reports_lines_lost_to_the_ring():
+    logs = LogBuffer(capacity=3)
+    for i in range(5):
+        logs.append(f"line {i}")
+    assert logs.cursor == 4
+    assert logs.since() == (["line 2", "line 3", "line 4"], True)
+    assert logs.since(1) == (["line 2", "line 3", "line 4"], False)
+    assert logs.since(3) == (["line 4"], False)
+
+
+def test_log_buffer_clips_long_lines(monkeypatch):
+    monkeypatch.setattr(missions, "LOG_LINE_MAX", 5)
+    logs = LogBuffer()
+    logs.append("abcdefgh")
+    assert logs.since() == (["abcde…"], False)
+
+
+def collect(bus, last_id=-1):
+    """Events a subscriber sees until the bus closes (heartbeats dropped)."""
+    async def run():
+        return [event async for event in bus.subscribe(last_id, heartbeat=0.01) if event is not None]
+    return asyncio.run(run())
+
+
+def test_event_bus_after_returns_newer_events():
+    bus = EventBus(capacity=10)
+    assert bus.after(-1) == ([], None)
+    bus.publish("log", {"n": 0})
+    bus.publish("phase", {"n": 1})
+    assert bus.after(-1) == ([(0, "log", {"n": 0}), (1, "phase", {"n": 1})], None)
+    assert bus.after(0) == ([(1, "phase", {"n": 1})], None)
+    assert bus.after(1) == ([], None)
+
+
+def test_event_bus_reports_the_first_missed_id():
+    bus = EventBus(capacity=2)
+    for n in range(5):
+        bus.publish("log", {"n": n})
+    events, gap = bus.after(0)
+    assert [e[0] for e in events] == [3, 4]
+    assert gap == 1
+
+
+def test_subscriber_replays_from_its_cursor_and_ends_on_close():
+    bus = EventBus(capacity=10)
+    for n in range(3):
+        bus.publish("log", {"n": n})
+    bus.close()
+    assert [e[0] for e in collect(bus)] == [0, 1, 2]
+    assert [e[0] for e in collect(bus, last_id=1)] == [2]
+
+
+def test_subscriber_that_fell_behind_gets_a_gap_event():
+    bus = EventBus(capacity=2)
+    for n in range(4):
+        bus.publish("log", {"n": n})
+    bus.close()
+    events = collect(bus)
+    assert events[0] == (1, "gap", {"missed_from": 0})
+    assert [e[0] for e in events[1:]] == [2, 3]
+
+
+def test_subscriber_wakes_on_publish():
+    async def run():
+        bus = EventBus()
+        seen = []
+
+        async def consume():
+            async for event in bus.subscribe(heartbeat=5):
+                seen.append(event)
+
+        consumer = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        bus.publish("status", {"status": "RUNNING"})
+        bus.close()
+        await asyncio.wait_for(consumer, 1)
+        return seen
+
+    assert asyncio.run(run()) == [(0, "status", {"status": "RUNNING"})]
+
+
+def span(start, end, *after):
+    return {"start": start, "end": end, "after": after}
+
+
+PIPELINE = {
+    "setup": span(0, 10),
+    "agent": span(10, 12, "setup"),
+    "build": span(10, 40, "setup"),
+    "strategy": span(12, 30, "agent"),
+    "attack": span(40, 60, "build", "strategy"),
+}
+
+
+def test_critical_path_follows_the_latest_dependency():
+    path, _ = critical_path(PIPELINE)
+    assert path == ["setup", "build", "attack"]
+
+
+def test_slack_is_how_long_dependents_still_waited():
+    _, slack = critical_path(PIPELINE)
+    assert slack["strategy"] == 10  # attack waited for the build until 40
+    assert slack["build"] == 0
+    assert slack["agent"] == 0
+    assert slack["attack"] == 0.0  # nothing depends on it
+
+
+def test_critical_path_ignores_unfinished_spans():
+    spans = dict(PIPELINE, heal=span(60, None, "attack"))
+    assert critical_path(spans)[0] == ["setup", "build", "attack"]
+    assert critical_path({"setup": span(0, None)}) == ([], {})
@@ -0,0 +1,50 @@
+import rollout
+
+
+def test_plan_splits_sources_and_resources():
+    files = ["src/main/java/com/x/A.java", "src/main/resources/application.properties",
+             "src/main/java/com/x/B.java"]
+    assert rollout.plan(files) == (["src/main/java/com/x/A.java", "src/main/java/com/x/B.java"],
+                                   ["src/main/resources/application.properties"])
+    assert rollout.plan([]) == ([], [])
+
+
+def test_anything_else_needs_a_rebuild():
+    assert rollout.plan(["src/main/java/com/x/A.java", "pom.xml"]) is None
+    assert rollout.plan(["Dockerfile"]) is None
+    assert rollout.plan(["src/test/java/com/x/ATest.java"]) is None
+    assert rollout.plan(["src/main/java/com/x/notes.txt"]) is None
+
+
+def test_redeploy_command_marks_each_group():
+    cmd = rollout.redeploy_command("victim", ["src/main/java/A.java"], ["src/main/resources/a.yml"])
+    assert cmd[:4] == ["docker", "exec", "victim", "sh"]
+    assert cmd[6:] == [rollout.SOURCE_MOUNT, "java", "src/main/java/A.java", "res", "src/main/resources/a.yml"]
+
+
+def report(outcome="standing", availability=None, **p99):
+    return {"outcome": outcome,
+            "monitor": {"availability": availability} if availability is not None else {},
+            "attacks": [{"name": name, "latency_ms": {"p99": value}} for name, value in p99.items()]}
+
+
+def test_no_regression_when_verify_is_no_worse():
+    assert rollout.regressions(report(availability=0.99, a=150), report(availability=0.98, a=200)) == []
+    assert rollout.regressions(report("crashed"), report("crashed")) == []
+
+
+def test_new_crash_is_a_regression():
+    assert rollout.regressions(report(), report("crashed")) == [
+        "the patched victim crashed under attacks the original survived"]
+
+
+def test_availability_drop_is_a_regression():
+    (reason,) = rollout.regressions(report(availability=0.99), report(availability=0.80))
+    assert "availability fell" in reason
+
+
+def test_p99_blowup_is_a_regression_above_the_noise_floor():
+    (reason,) = rollout.regressions(report(a=200), report(a=500))
+    assert reason.startswith("'a' p99")
+    assert rollout.regressions(report(a=10), report(a=90)) == []  # under REGRESSION_P99_FLOOR_MS
+    assert rollout.regressions(report(), report(b=900)) == []  # no baseline to compare with
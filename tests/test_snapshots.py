@@ -0,0 +1,105 @@
+import os
+import time
+
+from snapshots import SnapshotStore
+
+
+def write(root, rel, text):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_take_is_content_addressed(tmp_path):
+    store = SnapshotStore(str(tmp_path / "store"))
+    tree = tmp_path / "tree"
+    write(tree, "src/A.java", "class A {}")
+    write(tree, "src/B.java", "class A {}")  # same content, one blob
+    first = store.take(str(tree))
+    assert store.take(str(tree)) == first
+    assert sorted(store.load(first)) == ["src/A.java", "src/B.java"]
+    assert sum(len(files) for _, _, files in os.walk(store.objects)) == 1
+
+
+def test_ignored_dirs_are_not_snapshotted(tmp_path):
+    store = SnapshotStore(str(tmp_path / "store"))
+    tree = tmp_path / "tree"
+    write(tree, "src/A.java", "a")
+    write(tree, "target/A.class", "compiled")
+    write(tree, ".git/HEAD", "ref")
+    assert list(store.load(store.take(str(tree)))) == ["src/A.java"]
+
+
+def test_restore_rewrites_only_what_differs(tmp_path):
+    store = SnapshotStore(str(tmp_path / "store"))
+    tree = tmp_path / "tree"
+    write(tree, "src/A.java", "original a")
+    write(tree, "src/B.java", "b")
+    snapshot = store.take(str(tree))
+
+    write(tree, "src/A.java", "patched a")
+    write(tree, "src/New.java", "added")
+    (tree / "src/B.java").unlink()
+    assert store.diff(snapshot, str(tree)) == ["src/A.java", "src/B.java", "src/New.java"]
+
+    assert sorted(store.restore(str(tree), snapshot)) == ["src/A.java", "src/B.java", "src/New.java"]
+    assert (tree / "src/A.java").read_text() == "original a"
+    assert (tree / "src/B.java").read_text() == "b"
+    assert not (tree / "src/New.java").exists()
+    assert store.diff(snapshot, str(tree)) == []
+    assert store.restore(str(tree), snapshot) == []
+
+
+def test_tags_resolve_to_snapshots(tmp_path):
+    store = SnapshotStore(str(tmp_path / "store"))
+    tree = tmp_path / "tree"
+    write(tree, "A.java", "a")
+    snapshot = store.take(str(tree), tag="pristine")
+    assert store.resolve("pristine") == snapshot
+    assert store.resolve("missing") is None
+
+
+def age(path, seconds):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_prune_keeps_newest_and_tagged_snapshots_and_their_blobs(tmp_path):
+    store = SnapshotStore(str(tmp_path / "store"))
+    tree = tmp_path / "tree"
+    ids = []
+    for n in range(4):
+        write(tree, "A.java", f"version {n}")
+        ids.append(store.take(str(tree), tag="pristine" if n == 0 else None))
+        age(os.path.join(store.manifests, ids[-1] + ".json"), 100 - n)
+    for directory, _, files in os.walk(store.objects):
+        for name in files:
+            age(os.path.join(directory, name), 7200)
+
+    store.prune(keep=1)
+    remaining = {name[:-len(".json")] for name in os.listdir(store.manifests)}
+    assert remaining == {ids[0], ids[3]}  # the tagged one and the newest
+    blobs = {name for _, _, files in os.walk(store.objects) for name in files}
+    assert blobs == {sha for snapshot in remaining for sha, _ in store.load(snapshot).values()}
+
+
+def test_prune_spares_fresh_unreferenced_blobs(tmp_path):
+    # A concurrent take() may have written blobs but not yet its manifest
+    store = SnapshotStore(str(tmp_path / "store"))
+    tree = tmp_path / "tree"
+    write(tree, "A.java", "a")
+    snapshot = store.take(str(tree))
+    os.remove(os.path.join(store.manifests, snapshot + ".json"))
+    store.prune(keep=0)
+    assert sum(len(files) for _, _, files in os.walk(store.objects)) == 1
+
+
+def test_take_refreshes_reused_blobs(tmp_path):
+    store = SnapshotStore(str(tmp_path / "store"))
+    tree = tmp_path / "tree"
+    write(tree, "A.java", "a")
+    (sha, _), = store.load(store.take(str(tree))).values()
+    blob = os.path.join(store.objects, sha[:2], sha)
+    age(blob, 7200)
+    store.take(str(tree))
+    assert time.time() - os.path.getmtime(blob) < 60